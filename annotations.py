@@ -0,0 +1,176 @@
+import math
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+import vars
+
+# right click modifiers => the suffix of their THEME_COLORS, by priority
+MODIFIER_COLORS = [
+    (QtCore.Qt.ControlModifier, "ctrl"),
+    (QtCore.Qt.AltModifier, "alt"),
+    (QtCore.Qt.ShiftModifier, "shift"),
+]
+
+
+def get_modifier_color(modifiers):
+    """
+    returns the color suffix of the pressed keyboard modifiers, or None
+    """
+    for modifier, color in MODIFIER_COLORS:
+        if modifiers & modifier:
+            return color
+    return None
+
+
+class AnnotationItem(QtWidgets.QGraphicsItem):
+    """
+    all the arrows (or marked squares) of a color, as a single scene item
+    painting a list of polygons. the polygons are drawn one by one, which
+    rasterizes much faster than one path of overlapping polygons, & cached
+    as a pixmap until they change
+    """
+
+    def __init__(self, color):
+        super().__init__()
+        self.brush = QtGui.QBrush(QtGui.QColor(vars.THEME_COLORS.get(color, color)))
+        self.polygons = []
+        self.bounding_rect = QtCore.QRectF()
+        self.setCacheMode(QtWidgets.QGraphicsItem.DeviceCoordinateCache)
+
+    def set_polygons(self, polygons):
+        self.prepareGeometryChange()
+        self.polygons = polygons
+        self.bounding_rect = QtCore.QRectF()
+        for polygon in polygons:
+            self.bounding_rect = self.bounding_rect.united(polygon.boundingRect())
+        self.update()
+
+    def boundingRect(self):
+        return self.bounding_rect
+
+    def paint(self, painter, option, widget=None):
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(self.brush)
+        for polygon in self.polygons:
+            painter.drawPolygon(polygon)
+
+
+class Annotations:
+    """
+    arrows & marked squares drawn over the board. all the annotations of a
+    color are batched into a single item, so that showing hundreds of them
+    doesn't add hundreds of scene items, & clearing them only empties a few
+    items
+    """
+
+    def __init__(self, chessboard, scene):
+        self.chessboard = chessboard
+        self.scene = scene
+        # (from square, to square) => color, square => color. a color is a
+        # THEME_COLORS key or any color name QColor understands
+        self.arrows = {}
+        self.marks = {}
+        # color => AnnotationItem of its arrows / marks
+        self.arrow_items = {}
+        self.mark_items = {}
+
+    def toggle_arrow(self, from_square, to_square, color):
+        """
+        adds an arrow, or removes it if the same one is already drawn
+        """
+        if self.arrows.get((from_square, to_square)) == color:
+            del self.arrows[(from_square, to_square)]
+        else:
+            self.arrows[(from_square, to_square)] = color
+        self.update_arrows()
+
+    def toggle_mark(self, square, color):
+        if self.marks.get(square) == color:
+            del self.marks[square]
+        else:
+            self.marks[square] = color
+        self.update_marks()
+
+    def clear(self):
+        if not self.arrows and not self.marks:
+            return
+        self.arrows = {}
+        self.marks = {}
+        for item in list(self.arrow_items.values()) + list(self.mark_items.values()):
+            item.set_polygons([])
+
+    def update_arrows(self):
+        """
+        rebuilds the polygons of every arrow color
+        """
+        polygons = {color: [] for color in self.arrow_items}
+        for (from_square, to_square), color in self.arrows.items():
+            if from_square != to_square:
+                polygons.setdefault(color, []).append(
+                    get_arrow_polygon(
+                        self.get_square_center(from_square),
+                        self.get_square_center(to_square),
+                    )
+                )
+        for color, color_polygons in polygons.items():
+            self.get_item(self.arrow_items, color, 2, 0.8).set_polygons(color_polygons)
+
+    def update_marks(self):
+        """
+        rebuilds the polygons of every marked square color
+        """
+        polygons = {color: [] for color in self.mark_items}
+        for square, color in self.marks.items():
+            _, _, x, y = self.chessboard.get_square_coordinates(square)
+            polygons.setdefault(color, []).append(
+                QtGui.QPolygonF(QtCore.QRectF(x, y, vars.SQUARE_SIZE, vars.SQUARE_SIZE))
+            )
+        for color, color_polygons in polygons.items():
+            self.get_item(self.mark_items, color, -1, 0.6).set_polygons(color_polygons)
+
+    def get_item(self, items, color, z_value, opacity):
+        """
+        returns the annotation item of a color, created on first use
+        """
+        item = items.get(color)
+        if item is None:
+            item = AnnotationItem(color)
+            item.setOpacity(opacity)
+            item.setZValue(z_value)
+            self.scene.addItem(item)
+            items[color] = item
+        return item
+
+    def get_square_center(self, square):
+        _, _, x, y = self.chessboard.get_square_coordinates(square)
+        return QtCore.QPointF(x + vars.SQUARE_SIZE / 2, y + vars.SQUARE_SIZE / 2)
+
+
+def get_arrow_polygon(start, end):
+    """
+    returns the polygon of an arrow from the center of a square to the
+    center of another one
+    """
+    line = QtCore.QLineF(start, end)
+    length = line.length()
+    shaft_width = vars.SQUARE_SIZE * 0.18
+    head_width = vars.SQUARE_SIZE * 0.45
+    head_length = min(vars.SQUARE_SIZE * 0.4, length)
+    # the arrow starts a bit away from the center of its square
+    shaft_start = min(vars.SQUARE_SIZE * 0.25, length - head_length)
+    shaft_end = length - head_length
+    polygon = QtGui.QPolygonF(
+        [
+            QtCore.QPointF(shaft_start, -shaft_width / 2),
+            QtCore.QPointF(shaft_end, -shaft_width / 2),
+            QtCore.QPointF(shaft_end, -head_width / 2),
+            QtCore.QPointF(length, 0),
+            QtCore.QPointF(shaft_end, head_width / 2),
+            QtCore.QPointF(shaft_end, shaft_width / 2),
+            QtCore.QPointF(shaft_start, shaft_width / 2),
+        ]
+    )
+    transform = QtGui.QTransform()
+    transform.translate(start.x(), start.y())
+    transform.rotateRadians(math.atan2(end.y() - start.y(), end.x() - start.x()))
+    return transform.map(polygon)
@@ -0,0 +1,112 @@
+import chess
+import numpy as np
+from PySide6 import QtCore, QtGui, QtWidgets
+
+import vars
+
+
+class AttackCounts:
+    """
+    how many pieces of each side attack every square, from the attack
+    bitboards of the pieces. the bitboards of the squares a move changed (&
+    of the sliders looking through them) are the only ones recomputed, the
+    counts are then summed over all 64 squares at once
+    """
+
+    def __init__(self):
+        # attack bitboard of the piece standing on each square (0 if empty)
+        self.masks = np.zeros(64, dtype="<u8")
+        self.is_white = np.zeros(64, dtype=bool)
+
+    def set_board(self, board):
+        for square in chess.SQUARES:
+            self.update_square(board, square)
+
+    def update(self, board, changed_squares):
+        """
+        updates the attack bitboards after the pieces of the given squares
+        changed (the rest of the board being the same)
+        """
+        changed_mask = 0
+        for square in changed_squares:
+            changed_mask |= chess.BB_SQUARES[square]
+        # a piece whose attacks reach a changed square may now see further,
+        # or less far (it can't have seen a square it now sees without the
+        # one blocking it having changed)
+        affected_squares = np.flatnonzero(self.masks & np.uint64(changed_mask))
+        for square in set(changed_squares).union(affected_squares.tolist()):
+            self.update_square(board, square)
+
+    def update_square(self, board, square):
+        piece = board.piece_at(square)
+        if piece is None:
+            self.masks[square] = 0
+        else:
+            self.masks[square] = board.attacks_mask(square)
+            self.is_white[square] = piece.color == chess.WHITE
+
+    def get_counts(self):
+        """
+        returns the (white, black) attack counts of the 64 squares
+        """
+        # one row of 64 bits per square, bit n being square n
+        attacked = np.unpackbits(
+            self.masks.view(np.uint8).reshape(64, 8), axis=1, bitorder="little"
+        )
+        white_counts = attacked[self.is_white].sum(axis=0)
+        black_counts = attacked[~self.is_white].sum(axis=0)
+        return white_counts, black_counts
+
+
+class AttackHeatmap:
+    """
+    shades each square by the side attacking it the most, as a single 8x8
+    pixels image item scaled over the board layer
+    """
+
+    def __init__(self, chessboard, scene):
+        self.chessboard = chessboard
+        self.attack_counts = AttackCounts()
+        self.attack_counts.set_board(chessboard.board)
+        self.item = QtWidgets.QGraphicsPixmapItem()
+        self.item.setScale(vars.SQUARE_SIZE)
+        # crisp squares, rather than blending the colors of neighbours
+        self.item.setTransformationMode(QtCore.Qt.FastTransformation)
+        self.item.setZValue(-2)
+        scene.addItem(self.item)
+        self.update_image()
+
+    def update(self, changes):
+        """
+        updates the heatmap after a BoardChange
+        """
+        self.attack_counts.update(self.chessboard.board, changes)
+        self.update_image()
+
+    def update_image(self):
+        white_counts, black_counts = self.attack_counts.get_counts()
+        balance = white_counts.astype(np.int16) - black_counts
+        white_color = QtGui.QColor(vars.THEME_COLORS["heatmap_white"])
+        black_color = QtGui.QColor(vars.THEME_COLORS["heatmap_black"])
+        rgba = np.empty((64, 4), dtype=np.uint8)
+        rgba[:, :3] = np.where(
+            (balance > 0)[:, None],
+            [white_color.red(), white_color.green(), white_color.blue()],
+            [black_color.red(), black_color.green(), black_color.blue()],
+        )
+        # the more attackers one side has over the other, the more opaque
+        rgba[:, 3] = np.minimum(np.abs(balance), 3) * 50
+
+        # square n is at rank n // 8, file n % 8: rank 8 comes first on screen
+        squares = rgba.reshape(8, 8, 4)
+        squares = (
+            squares[:, ::-1] if self.chessboard.is_board_flipped else squares[::-1]
+        )
+        pixels = np.ascontiguousarray(squares)
+        image = QtGui.QImage(
+            pixels.tobytes(), 8, 8, 8 * 4, QtGui.QImage.Format_RGBA8888
+        ).copy()
+        self.item.setPixmap(QtGui.QPixmap.fromImage(image))
+
+    def remove(self):
+        self.item.scene().removeItem(self.item)
@@ -0,0 +1,100 @@
+"""
+throughput benchmark of the headless board core (no QApplication needed)
+
+    python -m benchmarks.bench_core --games 2000
+"""
+
+import argparse
+import random
+import time
+
+import chess
+
+from boardcore import BoardCore
+from movemanager import MoveManager
+
+
+def generate_games(game_count, max_plies, chess960, seed):
+    """
+    returns random (but legal) games as (starting board, [moves])
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(game_count):
+        if chess960:
+            board = chess.Board.from_chess960_pos(rng.randint(0, 959))
+        else:
+            board = chess.Board()
+        starting_board = board.copy()
+        moves = []
+        while len(moves) < max_plies and not board.is_game_over():
+            move = rng.choice(list(board.legal_moves))
+            board.push(move)
+            moves.append(move)
+        games.append((starting_board, moves))
+    return games
+
+
+def bench_push(games):
+    """
+    applies the games through BoardCore.push, with a listener subscribed
+    """
+    changed_squares = 0
+
+    def on_board_change(board_change):
+        nonlocal changed_squares
+        changed_squares += len(board_change.changes)
+
+    start = time.perf_counter()
+    for starting_board, moves in games:
+        core = BoardCore()
+        core.set_board(starting_board.copy())
+        core.subscribe(on_board_change)
+        for move in moves:
+            core.push(move)
+    return time.perf_counter() - start, changed_squares
+
+
+def bench_move_manager(games):
+    """
+    applies the games the way clicks do: select a square, then move_piece
+    """
+    start = time.perf_counter()
+    for starting_board, moves in games:
+        core = BoardCore()
+        core.set_board(starting_board.copy())
+        move_manager = MoveManager(core)
+        for move in moves:
+            move_manager.selected_square = move.from_square
+            move_manager.move_piece(move.to_square, move.promotion)
+            move_manager.selected_square = None
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--max-plies", type=int, default=80)
+    parser.add_argument("--chess960", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    games = generate_games(args.games, args.max_plies, args.chess960, args.seed)
+    plies = sum(len(moves) for _, moves in games)
+
+    elapsed, changed_squares = bench_push(games)
+    print(
+        f"BoardCore.push:          {len(games) / elapsed:10.0f} games/s "
+        f"{plies / elapsed:10.0f} plies/s "
+        f"({changed_squares / plies:.2f} changed squares/ply)"
+    )
+
+    elapsed = bench_move_manager(games)
+    print(
+        f"MoveManager.move_piece:  {len(games) / elapsed:10.0f} games/s "
+        f"{plies / elapsed:10.0f} plies/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
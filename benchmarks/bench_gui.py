@@ -0,0 +1,355 @@
+"""
+latency benchmark of the board GUI, run on the offscreen Qt platform
+
+    python -m benchmarks.bench_gui --output bench_gui.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import chess
+import PySide6
+from PySide6 import QtCore, QtGui, QtWidgets
+
+import vars
+from broadcastview import BroadcastView
+from chesspieces import PIECE_IMAGES_CACHE
+from gameclock import ChessClock, parse_time_control
+from main import ApplicationWindow
+
+
+def summarize(samples):
+    """
+    returns the statistics of a list of durations (seconds) in milliseconds
+    """
+    samples = sorted(sample * 1000 for sample in samples)
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "min_ms": samples[0],
+        "max_ms": samples[-1],
+    }
+
+
+def count_scene_items(chess_board):
+    return len(chess_board.scene.items())
+
+
+def click_square(chess_board, square):
+    """
+    sends a synthetic left click on the center of a square to the board
+    """
+    _, _, x, y = chess_board.get_square_coordinates(square)
+    pos = QtCore.QPointF(
+        chess_board.mapFromScene(
+            QtCore.QPointF(x + vars.SQUARE_SIZE / 2, y + vars.SQUARE_SIZE / 2)
+        )
+    )
+    event = QtGui.QMouseEvent(
+        QtCore.QEvent.MouseButtonPress,
+        pos,
+        pos,
+        QtCore.Qt.LeftButton,
+        QtCore.Qt.LeftButton,
+        QtCore.Qt.NoModifier,
+    )
+    chess_board.mousePressEvent(event)
+
+
+def render(chess_board):
+    """
+    paints the board viewport synchronously, like the next frame would
+    """
+    chess_board.viewport().repaint()
+
+
+def generate_game(plies, seed):
+    rng = random.Random(seed)
+    board = chess.Board()
+    moves = []
+    while len(moves) < plies and not board.is_game_over():
+        # queen promotions only, the piece a click promotes to without picker
+        move = rng.choice(
+            [
+                move
+                for move in board.legal_moves
+                if move.promotion in (None, chess.QUEEN)
+            ]
+        )
+        board.push(move)
+        moves.append(move)
+    return moves
+
+
+def bench_startup(app, runs):
+    """
+    ApplicationWindow.__init__ (which draws the chessboard) to first frame
+    """
+    init_samples = []
+    first_frame_samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        window = ApplicationWindow()
+        init_samples.append(time.perf_counter() - start)
+        window.show()
+        render(window.chess_board)
+        first_frame_samples.append(time.perf_counter() - start)
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+    return {
+        "window_init": summarize(init_samples),
+        "first_frame": summarize(first_frame_samples),
+    }
+
+
+def bench_clicks(chess_board, moves):
+    """
+    click-to-highlight (selecting a piece) & move-to-render (dropping it)
+    """
+    highlight_samples = []
+    move_samples = []
+    max_items = count_scene_items(chess_board)
+    for move in moves:
+        start = time.perf_counter()
+        click_square(chess_board, move.from_square)
+        render(chess_board)
+        highlight_samples.append(time.perf_counter() - start)
+        max_items = max(max_items, count_scene_items(chess_board))
+
+        start = time.perf_counter()
+        click_square(chess_board, move.to_square)
+        render(chess_board)
+        move_samples.append(time.perf_counter() - start)
+        if chess_board.board.peek() != move:
+            raise RuntimeError(f"{move} wasn't played by the synthetic clicks")
+    return {
+        "click_to_highlight": summarize(highlight_samples),
+        "move_to_render": summarize(move_samples),
+        "max_scene_items": max_items,
+    }
+
+
+def bench_replay(chess_board, rounds):
+    """
+    steps through the whole game back & forth, rendering every ply
+    """
+    last_ply = len(chess_board.core.history)
+    plies = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for ply in list(range(last_ply - 1, -1, -1)) + list(range(1, last_ply + 1)):
+            chess_board.core.go_to_ply(ply)
+            render(chess_board)
+            plies += 1
+    elapsed = time.perf_counter() - start
+    return {"plies": plies, "plies_per_second": plies / elapsed}
+
+
+def bench_broadcast(app, board_count, move_count, seed):
+    """
+    random moves played on random boards of a broadcast grid, each one
+    followed by the repaint of its board
+    """
+    view = BroadcastView(board_count)
+    view.resize(1400, 1400)
+    view.show()
+    # lets the resize debounce re-rasterize the pieces for the grid size
+    deadline = time.perf_counter() + 2
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        if all(
+            board.render_scale == board.get_render_scale()
+            and board.chess_pieces.piece_images_key[1:]
+            in PIECE_IMAGES_CACHE.piece_images
+            for board in view.boards
+        ):
+            break
+
+    rng = random.Random(seed)
+    move_samples = []
+    for _ in range(move_count):
+        board = rng.choice(view.boards)
+        if board.board.is_game_over():
+            board.core.set_board(chess.Board())
+        move = rng.choice(list(board.board.legal_moves))
+        start = time.perf_counter()
+        board.core.push(move)
+        render(board)
+        move_samples.append(time.perf_counter() - start)
+
+    piece_pixmaps = {
+        item.pixmap().cacheKey()
+        for board in view.boards
+        for item in board.chess_pieces.piece_items.values()
+    }
+    view.close()
+    view.deleteLater()
+    app.processEvents()
+    return {
+        "boards": board_count,
+        "move_to_render": summarize(move_samples),
+        "distinct_piece_pixmaps": len(piece_pixmaps),
+    }
+
+
+def bench_engine(app, window, moves):
+    """
+    click-to-render latencies while a stub engine floods info lines, with
+    the event loop running between the clicks like in the application
+    """
+    window.chess_board.core.go_to_ply(0)
+    window.chess_board.core.truncate_history(0)
+    stub_engine = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "stub_engine.py"
+    )
+    updates = []
+    window.start_analysis([sys.executable, stub_engine, "--info-per-second", "0"])
+    window.engine_analysis.info_updated.connect(updates.append)
+
+    move_samples = []
+    event_loop_samples = []
+    start_time = time.perf_counter()
+    for move in moves:
+        for _ in range(10):
+            start = time.perf_counter()
+            app.processEvents()
+            event_loop_samples.append(time.perf_counter() - start)
+            time.sleep(0.002)
+        start = time.perf_counter()
+        click_square(window.chess_board, move.from_square)
+        click_square(window.chess_board, move.to_square)
+        render(window.chess_board)
+        move_samples.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - start_time
+    window.stop_analysis()
+    return {
+        "move_to_render": summarize(move_samples),
+        "event_loop_iteration": summarize(event_loop_samples),
+        "info_updates_per_second": len(updates) / elapsed,
+    }
+
+
+def run_event_loop(seconds):
+    event_loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(round(seconds * 1000), event_loop.quit)
+    event_loop.exec()
+
+
+def bench_clocks(clock_count, seconds):
+    """
+    cpu used while many clocks run, & how late after their deadline
+    clocks running out of time flag
+    """
+    clocks = [ChessClock(parse_time_control("300")) for _ in range(clock_count)]
+    changes = []
+    for clock in clocks:
+        clock.changed.connect(lambda: changes.append(None))
+        clock.start(chess.WHITE)
+    cpu_start = time.process_time()
+    start_time = time.perf_counter()
+    run_event_loop(seconds)
+    elapsed = time.perf_counter() - start_time
+    cpu_time = time.process_time() - cpu_start
+    for clock in clocks:
+        clock.stop()
+
+    flag_delays = []
+    clocks = [
+        ChessClock(parse_time_control(f"{0.2 + index * 0.01:.2f}"))
+        for index in range(clock_count)
+    ]
+    for clock in clocks:
+        clock.start(chess.WHITE)
+        deadline_ns = clock.turn_start_ns + clock.remaining_ns[chess.WHITE]
+        clock.flagged.connect(
+            lambda color, deadline_ns=deadline_ns: flag_delays.append(
+                (time.monotonic_ns() - deadline_ns) / 1e9
+            )
+        )
+    run_event_loop(0.4 + clock_count * 0.01)
+    return {
+        "clocks": clock_count,
+        "cpu_percent": cpu_time / elapsed * 100,
+        "wakeups_per_second": len(changes) / elapsed,
+        "flag_delay": summarize(flag_delays),
+    }
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--startup-runs", type=int, default=10)
+    parser.add_argument("--plies", type=int, default=120)
+    parser.add_argument("--replay-rounds", type=int, default=3)
+    parser.add_argument("--broadcast-boards", type=int, default=64)
+    parser.add_argument("--broadcast-moves", type=int, default=1000)
+    parser.add_argument("--clocks", type=int, default=50)
+    parser.add_argument("--clock-seconds", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write (stdout by default)")
+    args = parser.parse_args()
+
+    # the platform plugin is picked when the QApplication gets created
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = {
+        "revision": get_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "pyside6": PySide6.__version__,
+        "qt_platform": app.platformName(),
+    }
+    results["startup"] = bench_startup(app, args.startup_runs)
+
+    window = ApplicationWindow()
+    window.show()
+    chess_board = window.chess_board
+    chess_board.move_manager.promotion_handler = None  # no promotion picker
+    render(chess_board)
+    results["scene_items_at_start"] = count_scene_items(chess_board)
+    results["clicks"] = bench_clicks(chess_board, generate_game(args.plies, args.seed))
+    results["scene_items_after_game"] = count_scene_items(chess_board)
+    results["replay"] = bench_replay(chess_board, args.replay_rounds)
+    results["engine"] = bench_engine(app, window, generate_game(args.plies, args.seed))
+    results["broadcast"] = bench_broadcast(
+        app, args.broadcast_boards, args.broadcast_moves, args.seed
+    )
+    results["clocks"] = bench_clocks(args.clocks, args.clock_seconds)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+scripted stand-in for a UCI engine, flooding info lines while it "thinks"
+
+    python benchmarks/stub_engine.py --info-per-second 5000
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+import chess
+
+
+def think(board, info_per_second, stop_event):
+    """
+    prints info lines with growing depths & random (legal) pvs until stopped
+    """
+    rng = random.Random(0)
+    legal_moves = list(board.legal_moves)
+    depth = 0
+    while not stop_event.is_set() and legal_moves:
+        depth += 1
+        pv_board = board.copy(stack=False)
+        pv = []
+        while len(pv) < 8 and not pv_board.is_game_over():
+            move = rng.choice(list(pv_board.legal_moves))
+            pv_board.push(move)
+            pv.append(move.uci())
+        print(
+            f"info depth {depth} score cp {rng.randint(-100, 100)}"
+            f" nodes {depth * 1000} nps 1000000 pv {' '.join(pv)}",
+            flush=True,
+        )
+        if info_per_second:
+            time.sleep(1 / info_per_second)
+    stop_event.wait()
+    print(f"bestmove {legal_moves[0].uci() if legal_moves else '0000'}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--info-per-second", type=float, default=1000, help="0 for no limit"
+    )
+    args = parser.parse_args()
+
+    board = chess.Board()
+    stop_event = None
+    thinking = None
+    for line in sys.stdin:
+        if not line.split():
+            continue
+        command, *arguments = line.split()
+        if command == "uci":
+            print("id name YACS stub engine\nuciok", flush=True)
+        elif command == "isready":
+            print("readyok", flush=True)
+        elif command == "position":
+            if arguments[0] == "startpos":
+                board = chess.Board()
+                moves = arguments[2:]
+            else:
+                moves_index = (
+                    arguments.index("moves") if "moves" in arguments else len(arguments)
+                )
+                board = chess.Board(" ".join(arguments[1:moves_index]))
+                moves = arguments[moves_index + 1 :]
+            for move in moves:
+                board.push_uci(move)
+        elif command == "go":
+            stop_event = threading.Event()
+            thinking = threading.Thread(
+                target=think, args=(board, args.info_per_second, stop_event)
+            )
+            thinking.start()
+        elif command == "stop" and thinking is not None:
+            stop_event.set()
+            thinking.join()
+            thinking = None
+        elif command == "quit":
+            break
+    if thinking is not None:
+        stop_event.set()
+        thinking.join()
+
+
+if __name__ == "__main__":
+    main()
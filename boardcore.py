@@ -0,0 +1,238 @@
+import chess
+
+import vars
+from chess960 import CHESS960_POSITIONS, get_start_position
+
+
+class BoardChange:
+    """
+    what changed on the board after a move (or after the position got replaced)
+    changes = {square: (piece_before, piece_after)}, only for changed squares
+    """
+
+    def __init__(
+        self,
+        changes,
+        move=None,
+        is_capture=False,
+        is_en_passant=False,
+        is_kingside_castling=False,
+        is_queenside_castling=False,
+    ):
+        self.changes = changes
+        self.move = move
+        self.is_capture = is_capture
+        self.is_en_passant = is_en_passant
+        self.is_kingside_castling = is_kingside_castling
+        self.is_queenside_castling = is_queenside_castling
+        self.promotion = move.promotion if move is not None else None
+
+
+class BoardCore:
+    """
+    the chess board model, without any Qt dependency.
+    applies moves & reports their side effects to the subscribed listeners
+    """
+
+    def __init__(self, chess960=False):
+        self.board = chess.Board(chess960=chess960)
+        # the Chess960Position the game started from, for its castling
+        # geometry (None if it started from another position)
+        self.start_position = get_start_position(self.board)
+        self.listeners = []
+        # every move played from the starting position, including the ones
+        # undone (until another move gets played), & board snapshots every
+        # vars.HISTORY_KEYFRAME_INTERVAL plies (taken when first jumped to)
+        self.history = []
+        self.keyframes = {0: self.board.copy()}
+
+    def subscribe(self, listener):
+        """
+        listener(board_change) gets called after every change of the board
+        """
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def notify(self, board_change):
+        for listener in self.listeners:
+            listener(board_change)
+
+    def push(self, move):
+        """
+        applies a (legal) move & returns its BoardChange
+        """
+        board = self.board
+        ply = len(board.move_stack)
+        if ply >= len(self.history) or self.history[ply] != move:
+            self.truncate_history(ply)
+            self.history.append(move)
+
+        is_castling = board.is_castling(move)
+        is_en_passant = not is_castling and board.is_en_passant(move)
+        is_capture = is_en_passant or board.is_capture(move)
+
+        squares = get_move_squares(board, move, self.start_position)
+        pieces_before = [board.piece_at(square) for square in squares]
+
+        board.push(move)
+
+        changes = {}
+        for square, piece_before in zip(squares, pieces_before):
+            piece_after = board.piece_at(square)
+            if piece_after != piece_before:
+                changes[square] = (piece_before, piece_after)
+
+        board_change = BoardChange(
+            changes,
+            move,
+            is_capture,
+            is_en_passant,
+            is_castling and move.to_square > move.from_square,
+            is_castling and move.to_square < move.from_square,
+        )
+        self.notify(board_change)
+        return board_change
+
+    def truncate_history(self, ply):
+        """
+        forgets the moves (& keyframes) after the given ply
+        """
+        del self.history[ply:]
+        for keyframe_ply in list(self.keyframes):
+            if keyframe_ply > ply:
+                del self.keyframes[keyframe_ply]
+
+    def set_board(self, board):
+        """
+        replaces the whole position (& move stack) of the board
+        """
+        return self.set_game(board.root(), board.move_stack)
+
+    def set_game(self, starting_board, moves, ply=None):
+        """
+        replaces the whole game by the given moves from a starting position,
+        & goes to the given ply (the last one by default)
+        """
+        self.history = list(moves)
+        self.keyframes = {0: starting_board.copy()}
+        self.start_position = get_start_position(starting_board)
+        board = starting_board.copy()
+        for move in self.history:
+            board.push(move)
+
+        piece_map_before = self.board.piece_map()
+        self.board = board
+        if ply is not None:
+            self.restore_ply(ply)
+        board_change = BoardChange(
+            get_piece_map_changes(piece_map_before, self.board.piece_map())
+        )
+        self.notify(board_change)
+        return board_change
+
+    def get_ply(self):
+        return len(self.board.move_stack)
+
+    def go_to_ply(self, ply):
+        """
+        moves through the history to the given ply & returns the BoardChange
+        (None if there's nothing to do)
+        """
+        ply = max(0, min(ply, len(self.history)))
+        if ply == self.get_ply():
+            return None
+        piece_map_before = self.board.piece_map()
+        self.restore_ply(ply)
+        board_change = BoardChange(
+            get_piece_map_changes(piece_map_before, self.board.piece_map())
+        )
+        self.notify(board_change)
+        return board_change
+
+    def restore_ply(self, ply):
+        """
+        sets the board to the given ply of the history, by popping/pushing a
+        few moves or by starting from the closest keyframe before it
+        """
+        current_ply = self.get_ply()
+        keyframe_ply = ply - ply % vars.HISTORY_KEYFRAME_INTERVAL
+        if (ply > current_ply and keyframe_ply > current_ply) or (
+            current_ply - ply > vars.HISTORY_KEYFRAME_INTERVAL
+        ):
+            self.board = self.get_keyframe(keyframe_ply).copy()
+            current_ply = keyframe_ply
+
+        while current_ply > ply:
+            self.board.pop()
+            current_ply -= 1
+        while current_ply < ply:
+            self.board.push(self.history[current_ply])
+            current_ply += 1
+
+    def get_keyframe(self, keyframe_ply):
+        """
+        returns the board snapshot at the given ply (a multiple of the
+        keyframe interval), taking it & the missing ones before it if needed
+        """
+        if keyframe_ply not in self.keyframes:
+            ply = max(p for p in self.keyframes if p < keyframe_ply)
+            board = self.keyframes[ply].copy()
+            while ply < keyframe_ply:
+                board.push(self.history[ply])
+                ply += 1
+                if ply % vars.HISTORY_KEYFRAME_INTERVAL == 0:
+                    self.keyframes[ply] = board.copy()
+        return self.keyframes[keyframe_ply]
+
+    def undo(self):
+        return self.go_to_ply(self.get_ply() - 1)
+
+    def redo(self):
+        return self.go_to_ply(self.get_ply() + 1)
+
+    def set_chess960_position(self, scharnagl):
+        return self.set_board(CHESS960_POSITIONS[scharnagl].get_board())
+
+
+def get_move_squares(board, move, start_position=None):
+    """
+    returns the squares whose piece may change by pushing the given move,
+    castling squares are looked up from the Chess960Position the game
+    started from, when known
+    """
+    if board.is_castling(move):
+        if start_position is not None:
+            # the king & rook squares can overlap in chess960
+            return list(
+                dict.fromkeys(
+                    start_position.get_castling_squares(
+                        board.turn, move.to_square > move.from_square
+                    )
+                )
+            )
+        # unknown starting position, any back rank square may change
+        back_rank = chess.square_rank(move.from_square)
+        return [chess.square(file, back_rank) for file in range(8)]
+    if board.is_en_passant(move):
+        return [
+            move.from_square,
+            move.to_square,
+            move.to_square - 8 if board.turn == chess.WHITE else move.to_square + 8,
+        ]
+    return [move.from_square, move.to_square]
+
+
+def get_piece_map_changes(piece_map_before, piece_map_after):
+    """
+    returns {square: (piece_before, piece_after)} for the squares that differ
+    between two piece maps
+    """
+    changes = {}
+    for square in piece_map_before.keys() | piece_map_after.keys():
+        piece_before = piece_map_before.get(square)
+        piece_after = piece_map_after.get(square)
+        if piece_before != piece_after:
+            changes[square] = (piece_before, piece_after)
+    return changes
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+
+from PySide6 import QtCore, QtGui
+
+import vars
+
+
+class BoardLayer:
+    """
+    the squares & coordinate labels of the board, rendered once into a pixmap
+    and painted as the scene background instead of being scene items
+    """
+
+    def __init__(self):
+        # (is_board_flipped, show_labels, square_size, render_scale, theme)
+        # => QPixmap, recently used last
+        self.pixmaps = OrderedDict()
+
+    def get_pixmap(self, is_board_flipped, show_labels, render_scale=1.0):
+        """
+        returns the cached board pixmap for the given orientation, rendering
+        it only if the theme, square size, render scale (view zoom x device
+        pixel ratio) or orientation changed
+        """
+        key = (
+            is_board_flipped,
+            show_labels,
+            vars.SQUARE_SIZE,
+            render_scale,
+            tuple(vars.THEME_COLORS.items()),
+        )
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self.render_pixmap(
+                is_board_flipped, show_labels, vars.SQUARE_SIZE, render_scale
+            )
+            self.pixmaps[key] = pixmap
+            # both orientations, with & without labels, of the latest sizes
+            while len(self.pixmaps) > vars.RENDER_SIZE_CACHE_SIZE * 4:
+                self.pixmaps.popitem(last=False)
+        else:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def render_pixmap(self, is_board_flipped, show_labels, square_size, render_scale):
+        board_size = round(square_size * 8 * render_scale)
+        pixel_ratio = board_size / (square_size * 8)
+        pixmap = QtGui.QPixmap(board_size, board_size)
+        painter = QtGui.QPainter(pixmap)
+        # scaled by hand, a painter ignores device pixel ratios below 1
+        painter.scale(pixel_ratio, pixel_ratio)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        draw_squares(painter, square_size)
+        if show_labels:
+            draw_labels(painter, is_board_flipped, square_size)
+        painter.end()
+        pixmap.setDevicePixelRatio(pixel_ratio)
+        return pixmap
+
+
+# shared by all the boards of the process
+BOARD_LAYER = BoardLayer()
+
+
+def draw_squares(painter, square_size):
+    """
+    draws squares forming a chessboard
+    """
+    painter.setPen(QtCore.Qt.NoPen)
+    for row in range(8):
+        for col in range(8):
+            rect_color = (
+                vars.THEME_COLORS["light_square"]
+                if (row + col) % 2 == 0
+                else vars.THEME_COLORS["dark_square"]
+            )
+            painter.fillRect(
+                QtCore.QRectF(
+                    col * square_size, row * square_size, square_size, square_size
+                ),
+                QtGui.QColor(rect_color),
+            )
+
+
+def draw_labels(painter, is_board_flipped, square_size):
+    """
+    draws rank (1-8) & file (a-h) label
+    """
+    font_metrics = QtGui.QFontMetricsF(painter.font())
+    # offset of the text baseline, the way a QGraphicsTextItem lays it out
+    text_offset = QtCore.QPointF(4, 4 + font_metrics.ascent())
+
+    for row in range(8):
+        for col in range(8):
+            if row != 7 and col != 0:
+                continue
+            x = col * square_size
+            y = row * square_size
+
+            label_color = (
+                vars.THEME_COLORS["light_square"]
+                if (row + col) % 2 != 0
+                else vars.THEME_COLORS["dark_square"]
+            )
+            painter.setPen(QtGui.QColor(label_color))
+
+            # Add label for the first set of columns (a-h)
+            if row == 7:
+                if is_board_flipped:
+                    label = f'{chr(ord("h")-col)}'
+                else:
+                    label = f'{chr(ord("a")+col)}'
+                col_label_x = x + square_size - square_size / 15 - 10
+                col_label_y = y + square_size - square_size / 8 - 15
+                painter.drawText(
+                    QtCore.QPointF(col_label_x, col_label_y) + text_offset, label
+                )
+
+            # Add label for the first set of rows (1-8)
+            if col == 0:
+                if is_board_flipped:
+                    label = f"{row+1}"
+                else:
+                    label = f"{8-row}"
+                row_label_x = x + square_size / 8 - 10
+                row_label_y = y + square_size / 8 - 10
+                painter.drawText(
+                    QtCore.QPointF(row_label_x, row_label_y) + text_offset, label
+                )
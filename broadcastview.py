@@ -0,0 +1,73 @@
+import math
+
+from PySide6 import QtCore, QtWidgets
+
+import vars
+from chessboard import DrawChessBoard
+
+
+class BroadcastView(QtWidgets.QWidget):
+    """
+    a grid of boards following many games at once (a tournament floor).
+    the boards share their piece images & board layer, & a move only
+    repaints the squares it changed, so the cost follows the moves played
+    rather than the number of boards
+    """
+
+    board_activated = QtCore.Signal(int)  # index of a double clicked board
+
+    def __init__(self, board_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Broadcast")
+        columns = math.ceil(math.sqrt(board_count))
+        layout = QtWidgets.QGridLayout(self)
+        layout.setSpacing(4)
+        self.boards = []
+        # shown as the tooltip of each board
+        self.titles = [""] * board_count
+        for index in range(board_count):
+            board = DrawChessBoard()
+            board.show_labels = False
+            board.setMinimumSize(vars.BROADCAST_BOARD_SIZE, vars.BROADCAST_BOARD_SIZE)
+            # the boards are only watched, clicks go to the grid
+            board.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+            board.setFocusPolicy(QtCore.Qt.NoFocus)
+            board.draw_chessboard()
+            layout.addWidget(board, index // columns, index % columns)
+            self.boards.append(board)
+
+    def set_game(self, index, game, ply=None, title=""):
+        """
+        shows a chess.pgn.Game on the board at the given index of the grid
+        """
+        self.boards[index].load_game(game, ply)
+        self.set_title(index, title)
+
+    def set_title(self, index, title):
+        self.titles[index] = title
+
+    def get_board_index(self, pos):
+        """
+        returns the index of the board under a position of the grid, or None
+        """
+        for index, board in enumerate(self.boards):
+            if board.geometry().contains(pos):
+                return index
+        return None
+
+    def event(self, event):
+        if event.type() == QtCore.QEvent.ToolTip:
+            index = self.get_board_index(event.pos())
+            if index is not None and self.titles[index]:
+                QtWidgets.QToolTip.showText(event.globalPos(), self.titles[index], self)
+            else:
+                QtWidgets.QToolTip.hideText()
+            return True
+        return super().event(event)
+
+    def mouseDoubleClickEvent(self, event):
+        index = self.get_board_index(event.position().toPoint())
+        if index is not None:
+            self.board_activated.emit(index)
+        else:
+            super().mouseDoubleClickEvent(event)
@@ -0,0 +1,105 @@
+import chess
+
+# files of the two knights among the 5 squares left by the bishops & queen,
+# by the last digit of the Scharnagl number
+KNIGHT_PLACEMENTS = [
+    (0, 1),
+    (0, 2),
+    (0, 3),
+    (0, 4),
+    (1, 2),
+    (1, 3),
+    (1, 4),
+    (2, 3),
+    (2, 4),
+    (3, 4),
+]
+
+
+class Chess960Position:
+    """
+    a chess960 starting position: its back rank & the king/rook squares of
+    castling, which only depend on where they started
+    """
+
+    def __init__(self, scharnagl, back_rank):
+        self.scharnagl = scharnagl
+        # piece symbols of the files a-h, e.g. "RNBQKBNR"
+        self.back_rank = back_rank
+        king_file = back_rank.index("K")
+        queenside_rook_file, kingside_rook_file = [
+            file for file, symbol in enumerate(back_rank) if symbol == "R"
+        ]
+        # (king from, king to, rook from, rook to) files, the king & rook end
+        # up on the same files as in standard chess
+        self.kingside_castling_files = (
+            king_file,
+            chess.FILE_NAMES.index("g"),
+            kingside_rook_file,
+            chess.FILE_NAMES.index("f"),
+        )
+        self.queenside_castling_files = (
+            king_file,
+            chess.FILE_NAMES.index("c"),
+            queenside_rook_file,
+            chess.FILE_NAMES.index("d"),
+        )
+
+    def get_fen(self):
+        return (
+            f"{self.back_rank.lower()}/pppppppp/8/8/8/8/PPPPPPPP/{self.back_rank}"
+            " w KQkq - 0 1"
+        )
+
+    def get_board(self):
+        return chess.Board(self.get_fen(), chess960=True)
+
+    def get_castling_squares(self, color, kingside):
+        """
+        returns the (king from, king to, rook from, rook to) squares of a
+        castling move
+        """
+        back_rank = 0 if color == chess.WHITE else 7
+        files = (
+            self.kingside_castling_files if kingside else self.queenside_castling_files
+        )
+        return tuple(chess.square(file, back_rank) for file in files)
+
+
+def get_back_rank(scharnagl):
+    """
+    returns the back rank of a chess960 starting position (0-959), following
+    the Scharnagl numbering
+    """
+    back_rank = [None] * 8
+    scharnagl, light_bishop = divmod(scharnagl, 4)
+    back_rank[light_bishop * 2 + 1] = "B"
+    scharnagl, dark_bishop = divmod(scharnagl, 4)
+    back_rank[dark_bishop * 2] = "B"
+    scharnagl, queen = divmod(scharnagl, 6)
+    free_files = [file for file in range(8) if back_rank[file] is None]
+    back_rank[free_files[queen]] = "Q"
+    free_files = [file for file in range(8) if back_rank[file] is None]
+    for knight in KNIGHT_PLACEMENTS[scharnagl]:
+        back_rank[free_files[knight]] = "N"
+    free_files = [file for file in range(8) if back_rank[file] is None]
+    for file, symbol in zip(free_files, "RKR"):
+        back_rank[file] = symbol
+    return "".join(back_rank)
+
+
+# the 960 starting positions, by Scharnagl number (518 is the standard one)
+CHESS960_POSITIONS = [
+    Chess960Position(scharnagl, get_back_rank(scharnagl)) for scharnagl in range(960)
+]
+
+
+def get_start_position(board):
+    """
+    returns the Chess960Position a board is set to, None if it isn't one of
+    the 960 starting positions (with all castling rights)
+    """
+    scharnagl = board.chess960_pos()
+    if scharnagl is None:
+        return None
+    return CHESS960_POSITIONS[scharnagl]
@@ -1,41 +1,46 @@
-import random
-
 import chess
-from PySide6 import QtCore, QtGui, QtSvg, QtSvgWidgets, QtWidgets
+from PySide6 import QtCore, QtGui, QtWidgets
 
+import piececache
 import vars
+from annotations import Annotations, get_modifier_color
+from boardcore import BoardCore
+from boardlayer import BOARD_LAYER
 from chesspieces import ChessPieces
 from movemanager import MoveManager
+from pawnpromotion import PawnPromotion
+from profiler import PROFILER, profiled
 
 
 class ChessBoard:
     def __init__(self):
         self.fischer_random = False
-        self.board = chess.Board(chess960=self.fischer_random)
+        self.core = BoardCore(chess960=self.fischer_random)
         self.is_board_flipped = False
-        self.move_manager = MoveManager(self)
-        self.starting_board_position_fen = None
+        self.move_manager = MoveManager(self.core)
+        # square number => pooled highlight circle, & the squares showing one
+        self.legal_move_highlights = {}
+        self.highlighted_squares = set()
+        # OpeningBook whose moves are hinted with the legal moves (or None),
+        # & square number => pooled label of the weight of a book move
+        self.opening_book = None
+        self.book_move_labels = {}
+
+    @property
+    def board(self):
+        return self.core.board
 
     def set_chess960_board(self):
-        self.board.set_chess960_pos(random.randint(1, 959))
+        import random  # only needed for chess960
+
+        self.core.set_chess960_position(random.randrange(960))
 
-    def get_pieces_squares(self, piece_name, piece_color):
+    def load_game(self, game, ply=None):
         """
-        returns the list of squares coordinates of the given piece name & color
-        get_pieces_squares(chess.ROOK, chess.WHITE) => [(0, 7), (7, 7)]
+        sets the board to the given chess.pgn.Game, at the given ply of its
+        mainline (the end of the game by default)
         """
-        squares = []
-        for square in self.board.pieces(piece_name, piece_color):
-            if self.is_board_flipped:
-                squares.append(
-                    (7 - chess.square_file(square), chess.square_rank(square))
-                )
-            else:
-                squares.append(
-                    (chess.square_file(square), 7 - chess.square_rank(square))
-                )
-
-        return squares
+        self.core.set_game(game.board(), game.mainline_moves(), ply)
 
     def get_square_coordinates(self, square_number):
         """
@@ -52,100 +57,124 @@ class ChessBoard:
 
     def get_selected_square_number(self, event):
         """
-        return the selected square number
+        return the selected square number, None if the event is outside of
+        the board (in the margins the view leaves around it)
         """
         pos = event.position().toPoint()
         mapped_pos = self.mapToScene(pos)
-        col = int(mapped_pos.x() / vars.SQUARE_SIZE)
-        row = int(mapped_pos.y() / vars.SQUARE_SIZE)
+        col = int(mapped_pos.x() // vars.SQUARE_SIZE)
+        row = int(mapped_pos.y() // vars.SQUARE_SIZE)
+        if not (0 <= col < 8 and 0 <= row < 8):
+            return None
         if self.is_board_flipped:
             return chess.square(7 - col, row)
         return chess.square(col, 7 - row)
 
-    def get_source_square_from_move(self, move):
+    def get_board_turn(self):
         """
-        returns a square coordinates where piece is moved from
-        source_square = get_source_square_from_move(e2e4)
-        => (4, 6)
+        returns which player's turn to play
         """
-        if self.is_board_flipped:
-            return (
-                7 - chess.square_file(move.from_square),
-                chess.square_rank(move.from_square),
-            )
-        return chess.square_file(move.from_square), 7 - chess.square_rank(
-            move.from_square
-        )
+        return "w" if self.board.turn == chess.WHITE else "b"
 
-    def get_destination_square_from_move(self, move):
+    def create_legal_move_highlights(self, scene):
         """
-        returns a square coordinates where piece is moved to
-        destination_square = get_destination_square_from_move(e2e4)
-        => (4, 4)
+        creates the (hidden) highlight circles of all 64 squares once, so that
+        selecting a piece only has to show/hide them
         """
-        if self.is_board_flipped:
-            return (
-                7 - chess.square_file(move.to_square),
-                chess.square_rank(move.to_square),
-            )
-        return chess.square_file(move.to_square), 7 - chess.square_rank(move.to_square)
+        for square in chess.SQUARES:
+            circle = scene.addEllipse(0, 0, vars.SQUARE_SIZE / 3, vars.SQUARE_SIZE / 3)
+            circle.setPen(QtCore.Qt.NoPen)
+            circle.setBrush(QtGui.QColor(vars.THEME_COLORS["highlight_legal_moves"]))
+            circle.setOpacity(0.45)
+            circle.setZValue(1)
+            circle.setVisible(False)
+            self.legal_move_highlights[square] = circle
 
-    def get_selected_piece_color_and_name(self, square_number):
-        """
-        returns the color and name of the piece at the selected square
+    def create_book_move_labels(self, scene):
         """
-        piece = self.board.piece_at(square_number)
-        if piece:
-            piece_color = "w" if piece.color == chess.WHITE else "b"
-            piece_name = piece.symbol().upper()
-            return piece_color, piece_name
-        return None, None
-
-    def get_board_turn(self):
+        creates the (hidden) book move labels of all 64 squares, once an
+        opening book is hinted on the board
         """
-        returns which player's turn to play
-        """
-        return "w" if self.board.turn == chess.WHITE else "b"
+        for square in chess.SQUARES:
+            label = scene.addSimpleText("")
+            label.setBrush(QtGui.QColor(vars.THEME_COLORS["book_move_hint"]))
+            font = label.font()
+            font.setBold(True)
+            label.setFont(font)
+            label.setZValue(1)
+            label.setVisible(False)
+            self.book_move_labels[square] = label
 
     def highlight_legal_moves(self, scene, square_number):
         """
         highlights the legal moves of a selected piece/square
         """
+        if not self.legal_move_highlights:
+            self.create_legal_move_highlights(scene)
+
         legal_moves = self.move_manager.get_legal_moves(square_number)
 
         for target_square in set(move.to_square for move in legal_moves):
-            col, row, x, y = self.get_square_coordinates(target_square)
-
-            # Add a circle in the center of the square
-            circle = scene.addEllipse(
-                x + vars.SQUARE_SIZE / 3,
-                y + vars.SQUARE_SIZE / 3,
-                vars.SQUARE_SIZE / 3,
-                vars.SQUARE_SIZE / 3,
-            )
-            circle.setPen(QtCore.Qt.NoPen)
-            circle.setBrush(QtGui.QColor(vars.THEME_COLORS["highlight_legal_moves"]))
-            circle.setOpacity(0.45)
+            _, _, x, y = self.get_square_coordinates(target_square)
+
+            # show the circle in the center of the square
+            circle = self.legal_move_highlights[target_square]
+            circle.setPos(x + vars.SQUARE_SIZE / 3, y + vars.SQUARE_SIZE / 3)
+            circle.setVisible(True)
+            self.highlighted_squares.add(target_square)
+
+        if self.opening_book is not None:
+            self.highlight_book_moves(square_number)
+
+    def highlight_book_moves(self, square_number):
+        """
+        shows the share of the book weights of the selected piece's book
+        moves, in the corner of their target squares
+        """
+        if not self.book_move_labels:
+            self.create_book_move_labels(self.scene)
+        target_weights = {}
+        for move, weight in self.opening_book.get_move_weights(self.board).items():
+            if move.from_square == square_number:
+                target_weights[move.to_square] = (
+                    target_weights.get(move.to_square, 0) + weight
+                )
+        for target_square, weight in target_weights.items():
+            _, _, x, y = self.get_square_coordinates(target_square)
+            label = self.book_move_labels[target_square]
+            label.setText(f"{weight:.0%}")
+            label.setPos(x + vars.SQUARE_SIZE - label.boundingRect().width() - 4, y + 2)
+            label.setVisible(True)
+            self.highlighted_squares.add(target_square)
 
     def delete_highlighted_legal_moves(self, scene):
-        items = scene.items()
-        for item in items:
-            if isinstance(item, QtWidgets.QGraphicsEllipseItem):
-                brush_color = item.brush().color()
-                if brush_color == QtGui.QColor(
-                    vars.THEME_COLORS["highlight_legal_moves"]
-                ):
-                    scene.removeItem(item)
+        for square in self.highlighted_squares:
+            self.legal_move_highlights[square].setVisible(False)
+            if square in self.book_move_labels:
+                self.book_move_labels[square].setVisible(False)
+        self.highlighted_squares.clear()
 
 
 class ChessBoardEvents:
     def __init__(self, chessboard):
         self.chessboard = chessboard
+        # square & color of an annotation being drawn (right click + modifier)
+        self.annotation_start = None
 
+    @profiled("mousePress")
     def mousePress(self, event):
         square_number = self.chessboard.get_selected_square_number(event)
-        if event.buttons() == QtCore.Qt.LeftButton:
-            if self.chessboard.move_manager.selected_square is None:
+        if square_number is None:
+            return  # pressed outside of the board
+        if event.buttons() == QtCore.Qt.RightButton:
+            color = get_modifier_color(event.modifiers())
+            if color is not None:
+                self.annotation_start = (square_number, color)
+        elif event.buttons() == QtCore.Qt.LeftButton:
+            self.chessboard.annotations.clear()
+            if self.chessboard.move_manager.pending_promotion_moves is not None:
+                self.pick_promotion(square_number)
+            elif self.chessboard.move_manager.selected_square is None:
                 self.chessboard.move_manager.selected_square = square_number
                 self.chessboard.highlight_legal_moves(
                     self.chessboard.scene, self.chessboard.move_manager.selected_square
@@ -161,43 +190,6 @@ class ChessBoardEvents:
                 self.chessboard.move_manager.move_piece(square_number)
 
                 if self.chessboard.move_manager.is_piece_moved is True:
-                    # this if condition is here because, in chess960 variant, user
-                    # have to click on a rook to do castling and don't know why the
-                    # `get_selected_piece_color_and_name` method returns None if user
-                    # try to click on a rook to do castling.
-                    # (tested on chess960 position number 665, 342 or similar positions)
-                    if self.chessboard.fischer_random and (
-                        self.chessboard.move_manager.is_queenside_castling
-                        or self.chessboard.move_manager.is_kingside_castling
-                    ):
-                        piece_color = (
-                            "b" if self.chessboard.board.turn == chess.WHITE else "w"
-                        )
-                        piece_name = "R"
-                    else:
-                        piece_color, piece_name = (
-                            self.chessboard.get_selected_piece_color_and_name(
-                                square_number
-                            )
-                        )
-                    last_move = self.chessboard.move_manager.get_last_move()
-                    source_square = self.chessboard.get_source_square_from_move(
-                        last_move
-                    )
-                    destination_square = (
-                        self.chessboard.get_destination_square_from_move(last_move)
-                    )
-
-                    self.chessboard.chess_pieces.delete_piece(source_square)
-
-                    if self.chessboard.move_manager.is_capture:
-                        self.chessboard.chess_pieces.delete_piece(destination_square)
-                        self.chessboard.move_manager.is_capture = False
-
-                    self.chessboard.chess_pieces.draw_piece(
-                        piece_name, piece_color, destination_square
-                    )
-
                     self.chessboard.move_manager.is_piece_moved = False
                     self.chessboard.move_manager.selected_square = None
                     self.chessboard.delete_highlighted_legal_moves(
@@ -205,87 +197,238 @@ class ChessBoardEvents:
                     )
                     square_number = None
 
+    def pick_promotion(self, square_number):
+        """
+        promotes to the piece clicked in the promotion picker, a click
+        anywhere else cancels the move
+        """
+        move_manager = self.chessboard.move_manager
+        piece_type = self.chessboard.pawn_promotion.get_piece_type(square_number)
+        self.chessboard.pawn_promotion.hide()
+        move_manager.selected_square = None
+        self.chessboard.delete_highlighted_legal_moves(self.chessboard.scene)
+        if piece_type is None:
+            move_manager.cancel_promotion()
+        else:
+            move_manager.complete_promotion(piece_type)
+            move_manager.is_piece_moved = False
+
+    def mouseRelease(self, event):
+        """
+        draws an arrow to the square the right click got released on, or
+        marks the square if it's the one it started from
+        """
+        if event.button() != QtCore.Qt.RightButton or self.annotation_start is None:
+            return
+        start_square, color = self.annotation_start
+        self.annotation_start = None
+        square_number = self.chessboard.get_selected_square_number(event)
+        if square_number is None:
+            return  # released outside of the board
+        if square_number == start_square:
+            self.chessboard.annotations.toggle_mark(
+                square_number, f"marked_square_{color}"
+            )
+        else:
+            self.chessboard.annotations.toggle_arrow(
+                start_square, square_number, f"arrow_{color}"
+            )
+
 
 class DrawChessBoard(QtWidgets.QGraphicsView, ChessBoard):
 
     def __init__(self):
         super().__init__()
-        self.scene = QtWidgets.QGraphicsScene()
+        self.scene = QtWidgets.QGraphicsScene(
+            0, 0, vars.SQUARE_SIZE * 8, vars.SQUARE_SIZE * 8
+        )
         self.setScene(self.scene)
+        self.board_layer = BOARD_LAYER
         self.setRenderHints(
             QtGui.QPainter.Antialiasing | QtGui.QPainter.SmoothPixmapTransform
         )
-        self.chess_pieces = ChessPieces(self, self.scene, "cardinal")
+        # the scene is scaled to fit the view, so no scrolling is needed
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        # scale the piece images & board layer are rasterized for, only
+        # updated once resizing stops
+        self.render_scale = self.get_render_scale()
+        self.resize_timer = QtCore.QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(vars.RESIZE_DEBOUNCE_INTERVAL)
+        self.resize_timer.timeout.connect(self.update_render_scale)
+        self.chess_pieces = ChessPieces(self, self.scene, vars.PIECE_SET)
         self.chess_pieces.load_chess_piece_images()
+        self.annotations = Annotations(self, self.scene)
+        self.attack_heatmap = None
         self.show_labels = True
         self.events = ChessBoardEvents(self)
-
-    def draw_squares(self):
+        # wheel rotation not stepped through yet (in eighths of a degree),
+        # touchpads & fine wheels sending much less than a notch at a time
+        self.wheel_delta = 0
+        self.pawn_promotion = PawnPromotion(self, self.scene)
+        self.move_manager.promotion_handler = self.pawn_promotion.show
+        self.core.subscribe(self.on_board_change)
+        # repaints the profiling overlay, while profiling is enabled
+        self.profiling_timer = QtCore.QTimer(self)
+        self.profiling_timer.setInterval(vars.PROFILER_OVERLAY_INTERVAL)
+        self.profiling_timer.timeout.connect(self.viewport().update)
+        self.set_profiling(PROFILER.enabled)
+
+    def on_board_change(self, board_change):
         """
-        draws squares forming a chessboard
+        redraws the pieces on the squares changed by a move (or new position)
         """
-        for square in chess.SQUARES:
-            col, row, x, y = self.get_square_coordinates(square)
+        if board_change.move is None:
+            self.move_manager.selected_square = None
+            self.delete_highlighted_legal_moves(self.scene)
+        if self.move_manager.pending_promotion_moves is not None:
+            # the position the promotion was picked in is gone
+            self.move_manager.cancel_promotion()
+            self.pawn_promotion.hide()
+        self.annotations.clear()
+        self.chess_pieces.update_pieces(board_change.changes)
+        if self.attack_heatmap is not None:
+            self.attack_heatmap.update(board_change.changes)
+
+    def drawBackground(self, painter, rect):
+        """
+        paints the cached squares & labels layer behind the scene items (the
+        painter is clipped to the region exposed by the items that changed)
+        """
+        painter.drawPixmap(
+            QtCore.QPointF(0, 0),
+            self.board_layer.get_pixmap(
+                self.is_board_flipped, self.show_labels, self.render_scale
+            ),
+        )
 
-            rect = self.scene.addRect(x, y, vars.SQUARE_SIZE, vars.SQUARE_SIZE)
+    def drawForeground(self, painter, rect):
+        if PROFILER.enabled:
+            self.draw_profiling_overlay(painter)
 
-            rect_color = (
-                vars.THEME_COLORS["light_square"]
-                if (row + col) % 2 == 0
-                else vars.THEME_COLORS["dark_square"]
+    def draw_profiling_overlay(self, painter):
+        """
+        draws the fps & the p50/p99 latencies of the timers in the top left
+        corner of the view
+        """
+        lines = PROFILER.get_summary_lines()
+        painter.save()
+        painter.resetTransform()
+        font_metrics = painter.fontMetrics()
+        line_height = font_metrics.height()
+        width = max(font_metrics.horizontalAdvance(line) for line in lines) + 10
+        painter.fillRect(
+            0, 0, width, line_height * len(lines) + 6, QtGui.QColor(0, 0, 0, 160)
+        )
+        painter.setPen(QtCore.Qt.white)
+        for line_number, line in enumerate(lines):
+            painter.drawText(
+                5, 3 + line_number * line_height + font_metrics.ascent(), line
             )
+        painter.restore()
+
+    def set_attack_heatmap(self, enabled):
+        """
+        shows/hides the squares shaded by the side attacking them the most
+        """
+        if enabled and self.attack_heatmap is None:
+            # numpy is only imported once the heatmap is shown
+            from attackheatmap import AttackHeatmap
+
+            self.attack_heatmap = AttackHeatmap(self, self.scene)
+        elif not enabled and self.attack_heatmap is not None:
+            self.attack_heatmap.remove()
+            self.attack_heatmap = None
+
+    def set_profiling(self, enabled):
+        PROFILER.enabled = enabled
+        if enabled:
+            self.profiling_timer.start()
+        else:
+            self.profiling_timer.stop()
+        self.viewport().update()
 
-            rect.setPen(QtCore.Qt.NoPen)
-            rect.setBrush(QtGui.QColor(rect_color))
+    def paintEvent(self, event):
+        with PROFILER.timed("scene repaint"):
+            super().paintEvent(event)
+        if PROFILER.enabled:
+            PROFILER.record_frame()
 
-    def draw_labels(self):
+    def get_render_scale(self):
         """
-        draws rank (1-8) & file (a-h) label
+        returns the device pixels per scene unit: the view zoom x the device
+        pixel ratio of the screen
         """
-        for square in chess.SQUARES:
-            col, row, x, y = self.get_square_coordinates(square)
+        render_scale = self.transform().m11() * self.devicePixelRatioF()
+        # rounded up to 4 pixels per square, so that boards of about the same
+        # size share their piece images & board layer
+        return piececache.get_pixel_size(vars.SQUARE_SIZE, render_scale) / (
+            vars.SQUARE_SIZE
+        )
 
-            # Determine label position
-            row_label_x = x + vars.SQUARE_SIZE / 8 - 10
-            row_label_y = y + vars.SQUARE_SIZE / 8 - 10
+    def resizeEvent(self, event):
+        """
+        scales the board to the view right away, the pixmaps drawn scaled
+        until resizing stops & they get re-rasterized at the new size
+        """
+        super().resizeEvent(event)
+        self.fitInView(self.scene.sceneRect(), QtCore.Qt.KeepAspectRatio)
+        self.resize_timer.start()
 
-            col_label_x = x + vars.SQUARE_SIZE - vars.SQUARE_SIZE / 15 - 10
-            col_label_y = y + vars.SQUARE_SIZE - vars.SQUARE_SIZE / 8 - 15
+    def update_render_scale(self):
+        """
+        re-rasterizes the piece images (in the thread pool) & the board layer
+        for the current zoom
+        """
+        render_scale = self.get_render_scale()
+        if render_scale == self.render_scale:
+            return
+        self.render_scale = render_scale
+        self.chess_pieces.load_chess_piece_images()
+        self.update_board_layer()
 
-            label_color = (
-                vars.THEME_COLORS["light_square"]
-                if (row + col) % 2 != 0
-                else vars.THEME_COLORS["dark_square"]
-            )
+    def set_piece_set(self, piece_set):
+        self.chess_pieces.set_piece_set(piece_set)
 
-            # Add label for the first set of columns (a-h)
-            if row == 7:
-                if self.is_board_flipped:
-                    label = self.scene.addText(f'{chr(ord("h")-col)}')
-                else:
-                    label = self.scene.addText(f'{chr(ord("a")+col)}')
-                label.setDefaultTextColor(QtGui.QColor(label_color))
-                label.setPos(col_label_x, col_label_y)
-
-            # Add label for the first set of rows (1-8)
-            if col == 0:
-                if self.is_board_flipped:
-                    label = self.scene.addText(f"{row+1}")
-                else:
-                    label = self.scene.addText(f"{8-row}")
-                label.setDefaultTextColor(QtGui.QColor(label_color))
-                label.setPos(row_label_x, row_label_y)
+    def update_board_layer(self):
+        """
+        repaints the board layer, after the theme/orientation/labels changed
+        """
+        self.resetCachedContent()
+        self.scene.update()
 
     def draw_chessboard(self):
         if self.fischer_random:
             self.set_chess960_board()
-        self.draw_squares()
-        if self.show_labels:
-            self.draw_labels()
         self.chess_pieces.draw_pieces()
-        self.starting_board_position_fen = (
-            self.board.board_fen()
-        )  # hack to get the fen of only starting position
 
     def mousePressEvent(self, event):
         self.events.mousePress(event)
+
+    def mouseReleaseEvent(self, event):
+        self.events.mouseRelease(event)
+
+    def wheelEvent(self, event):
+        """
+        scrolling up/down steps backward/forward through the move history
+        """
+        self.wheel_delta += event.angleDelta().y()
+        # a ply per notch (120) either way, the rest carried to the next event
+        steps = int(self.wheel_delta / 120)
+        self.wheel_delta -= steps * 120
+        if steps:
+            self.core.go_to_ply(self.core.get_ply() - steps)
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key == QtCore.Qt.Key_Left:
+            self.core.undo()
+        elif key == QtCore.Qt.Key_Right:
+            self.core.redo()
+        elif key == QtCore.Qt.Key_Home:
+            self.core.go_to_ply(0)
+        elif key == QtCore.Qt.Key_End:
+            self.core.go_to_ply(len(self.core.history))
+        else:
+            super().keyPressEvent(event)
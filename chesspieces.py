@@ -1,7 +1,85 @@
+from collections import OrderedDict
+
 import chess
-from PySide6 import QtCore, QtGui, QtSvg, QtSvgWidgets, QtWidgets
+from PySide6 import QtCore, QtWidgets
 
+import piececache
 import vars
+from profiler import profiled
+
+
+class PieceImagesCache(QtCore.QObject):
+    """
+    the piece images of all the boards of the process: a sprite atlas of
+    every piece set per size, rasterized in the thread pool & cut into
+    pixmaps once. the latest few sizes are kept, so that boards of the same
+    size share the same pixmaps, & switching piece set needs no loading
+    """
+
+    # (size, pixel_size), atlas QImage, piece sets: emitted by the worker
+    image_data_loaded = QtCore.Signal(object, object, object)
+    loaded = QtCore.Signal(object)  # (size, pixel_size) of the atlas cached
+
+    def __init__(self):
+        super().__init__()
+        # (size, pixel_size) => {piece_set: piece images}, recently used last
+        self.piece_images = OrderedDict()
+        self.pending_keys = set()
+        self.image_data_loaded.connect(self.on_image_data_loaded)
+
+    def get(self, key):
+        """
+        returns the cached {piece_set: {(piece_color, piece_name): QPixmap}}
+        of a (size, pixel_size), or None
+        """
+        piece_images = self.piece_images.get(key)
+        if piece_images is not None:
+            self.piece_images.move_to_end(key)
+        return piece_images
+
+    def load(self, key, asynchronous=True):
+        """
+        rasterizes the atlas of the given (size, pixel_size), once however
+        many boards ask for it: loaded is emitted when it is cached
+        """
+        _, pixel_size = key
+        if not asynchronous:
+            self.pending_keys.discard(key)
+            self.on_image_data_loaded(key, *piececache.load_atlas_image(pixel_size))
+        elif key not in self.pending_keys:
+            self.pending_keys.add(key)
+            QtCore.QThreadPool.globalInstance().start(
+                lambda: self.image_data_loaded.emit(
+                    key, *piececache.load_atlas_image(pixel_size)
+                )
+            )
+
+    def on_image_data_loaded(self, key, atlas_image, piece_sets):
+        if key not in self.piece_images:
+            self.pending_keys.discard(key)
+            self.piece_images[key] = piececache.atlas_to_pixmaps(
+                atlas_image, piece_sets, key[0]
+            )
+            while len(self.piece_images) > vars.RENDER_SIZE_CACHE_SIZE:
+                self.piece_images.popitem(last=False)
+        self.loaded.emit(key)
+
+
+PIECE_IMAGES_CACHE = PieceImagesCache()
+
+
+class PieceImagesLoader(QtCore.QObject):
+    """
+    delivers the piece images arriving in the shared cache to one board,
+    disconnected from the cache as soon as the board gets destroyed
+    """
+
+    loaded = QtCore.Signal(object)  # (size, pixel_size)
+    ready = QtCore.Signal()  # the loaded images are shown
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        PIECE_IMAGES_CACHE.loaded.connect(self.loaded)
 
 
 class ChessPieces:
@@ -11,221 +89,119 @@ class ChessPieces:
         self.scene = scene
         self.piece_images = {}
         self.piece_set = piece_set
+        # square number => QGraphicsPixmapItem of the piece standing on it
+        self.piece_items = {}
+        # (piece_set, size, pixel_size) of the piece images shown
+        self.piece_images_key = None
+        self.piece_images_loader = PieceImagesLoader(chessboard)
+        self.piece_images_loader.loaded.connect(self.on_piece_images_loaded)
+
+    def load_chess_piece_images(self, asynchronous=True):
+        """
+        loads the piece images rasterized for the render scale of the board,
+        in the thread pool by default: the current images (or placeholder
+        pieces, at startup) are shown, scaled, until they are ready
+        """
+        size = vars.SQUARE_SIZE - 10
+        pixel_size = piececache.get_pixel_size(size, self.chessboard.render_scale)
+        key = (self.piece_set, size, pixel_size)
+        if key == self.piece_images_key:
+            return
+        self.piece_images_key = key
+        piece_sets = PIECE_IMAGES_CACHE.get((size, pixel_size))
+        if piece_sets is not None:
+            self.piece_images = piece_sets[self.piece_set]
+            self.update_piece_images()
+            return
+        if asynchronous and not self.piece_images:
+            self.piece_images = piececache.render_placeholder_images(
+                size, self.chessboard.render_scale
+            )
+        PIECE_IMAGES_CACHE.load((size, pixel_size), asynchronous)
 
-    def load_chess_piece_images(self):
-        piece_names = ["P", "N", "B", "R", "Q", "K"]
-        for piece_name in piece_names:
-            piece_image_paths = {
-                "w": f"assets/pieces/{self.piece_set}/w{piece_name}.svg",
-                "b": f"assets/pieces/{self.piece_set}/b{piece_name}.svg",
-            }
-            for piece_color, image_path in piece_image_paths.items():
-                renderer = QtSvg.QSvgRenderer(image_path)
-                pixmap = QtGui.QPixmap(vars.SQUARE_SIZE - 10, vars.SQUARE_SIZE - 10)
-                pixmap.fill(QtCore.Qt.transparent)
-                painter = QtGui.QPainter(pixmap)
-                renderer.render(painter)
-                painter.end()
-                self.piece_images[(piece_color, piece_name)] = pixmap
+    def set_piece_set(self, piece_set):
+        """
+        switches to another piece set, the piece items only getting pointed
+        to its images (already in the atlas of the current size)
+        """
+        self.piece_set = piece_set
+        self.load_chess_piece_images()
 
-    def draw_pieces(self):
-        piece_list = self.chessboard.board.fen().split()[0]
-        square = 0
-        for char in piece_list:
-            if char.isdigit():
-                square += int(char)
-            elif char != "/":
-                piece_name = char.upper()
-                piece_color = "w" if char.isupper() else "b"
-
-                if self.chessboard.is_board_flipped:
-                    x = (7 - square % 8) * vars.SQUARE_SIZE + 5
-                    y = (7 - square // 8) * vars.SQUARE_SIZE + 5
-                else:
-                    x = (square % 8) * vars.SQUARE_SIZE + 5
-                    y = (square // 8) * vars.SQUARE_SIZE + 5
-
-                piece_item = QtWidgets.QGraphicsPixmapItem(
-                    self.piece_images[(piece_color, piece_name)]
-                )
-                piece_item.setPos(x, y)
-                self.scene.addItem(piece_item)
+    def on_piece_images_loaded(self, key):
+        if key != self.piece_images_key[1:]:
+            return  # for another board, or the size changed
+        self.piece_images = PIECE_IMAGES_CACHE.get(key)[self.piece_set]
+        self.update_piece_images()
+        self.piece_images_loader.ready.emit()
 
-                square += 1
+    def update_piece_images(self):
+        """
+        points the piece items to the current piece images
+        """
+        for square, item in self.piece_items.items():
+            item.setPixmap(self.get_piece_image(self.chessboard.board.piece_at(square)))
+
+    def get_piece_image(self, piece):
+        """
+        returns the pixmap of the given chess.Piece
+        """
+        piece_color = "w" if piece.color == chess.WHITE else "b"
+        return self.piece_images[(piece_color, piece.symbol().upper())]
+
+    def draw_pieces(self):
+        for square, piece in self.chessboard.board.piece_map().items():
+            self.draw_piece(piece, square)
 
     def delete_pieces(self):
-        items = self.scene.items()
-        for item in items:
-            if isinstance(item, QtWidgets.QGraphicsPixmapItem):
-                self.scene.removeItem(item)
+        for item in self.piece_items.values():
+            self.scene.removeItem(item)
+        self.piece_items.clear()
 
     def delete_piece(self, square):
-        items = self.scene.items()
-        x = square[0] * vars.SQUARE_SIZE + 5
-        y = square[1] * vars.SQUARE_SIZE + 5
-        for item in items:
-            if isinstance(
-                item, QtWidgets.QGraphicsPixmapItem
-            ) and item.pos() == QtCore.QPointF(x, y):
-                self.scene.removeItem(item)
+        item = self.piece_items.pop(square, None)
+        if item is not None:
+            self.scene.removeItem(item)
+
+    @profiled("draw_piece")
+    def draw_piece(self, piece, square):
+        self.delete_piece(square)
 
-    def get_piece_position(self, piece_name, fen):
-        rows = fen.split("/")
-
-        piece_positions = []
-        for y, row in enumerate(rows):
-            x = 0
-            for char in row:
-                if char in piece_name:
-                    if self.chessboard.is_board_flipped:
-                        piece_positions.append((7 - x, 7 - y))
-                    else:
-                        piece_positions.append((x, y))
-                if char.isdigit():
-                    x += int(char)
-                else:
-                    x += 1
-
-        return piece_positions
-
-    def draw_piece(self, piece_name, piece_color, destination_square):
-        x = destination_square[0] * vars.SQUARE_SIZE + 5
-        y = destination_square[1] * vars.SQUARE_SIZE + 5
-
-        piece_item = QtWidgets.QGraphicsPixmapItem(
-            self.piece_images[(piece_color, piece_name)]
-        )
-        piece_item.setPos(x, y)
+        piece_item = QtWidgets.QGraphicsPixmapItem(self.get_piece_image(piece))
+        self.place_piece_item(piece_item, square)
         self.scene.addItem(piece_item)
 
-        self.handle_special_cases(piece_color, destination_square)
-
-    def handle_special_cases(self, piece_color, destination_square):
-        """
-        handle special cases such as, castling & en-passant
-        for drawing and removing pieces at source & destination square
-        """
-        white_rooks_positions = self.chessboard.get_pieces_squares(
-            chess.ROOK, chess.WHITE
-        )
-        black_rooks_positions = self.chessboard.get_pieces_squares(
-            chess.ROOK, chess.BLACK
-        )
-        white_king_position = self.chessboard.get_pieces_squares(
-            chess.KING, chess.WHITE
-        )
-        black_king_position = self.chessboard.get_pieces_squares(
-            chess.KING, chess.BLACK
-        )
-
-        white_rooks_positions_before_castling = self.get_piece_position(
-            ["R"], self.chessboard.starting_board_position_fen
-        )
-        black_rooks_positions_before_castling = self.get_piece_position(
-            ["r"], self.chessboard.starting_board_position_fen
-        )
-        white_king_position_before_castling = self.get_piece_position(
-            ["K"], self.chessboard.starting_board_position_fen
-        )
-        black_king_position_before_castling = self.get_piece_position(
-            ["k"], self.chessboard.starting_board_position_fen
-        )
-
-        ep_pawn_square = (
-            destination_square[0],
-            (
-                destination_square[1] + 1
-                if piece_color == "w"
-                else destination_square[1] - 1
-            ),
-        )
-
-        # check if the move is kingside castling
-        if self.chessboard.move_manager.is_kingside_castling == True:
-            # delete the rook from old square
-            if piece_color == "w":
-                self.delete_piece(white_rooks_positions_before_castling[1])
-            if piece_color == "b":
-                self.delete_piece(black_rooks_positions_before_castling[1])
-
-            # draw the rook to new square
-            rook = QtWidgets.QGraphicsPixmapItem(
-                self.piece_images[("w" if piece_color == "w" else "b", "R")]
-            )
-            if piece_color == "w":
-                x = white_rooks_positions[1][0] * vars.SQUARE_SIZE + 5
-                y = white_rooks_positions[1][1] * vars.SQUARE_SIZE + 5
-            if piece_color == "b":
-                x = black_rooks_positions[1][0] * vars.SQUARE_SIZE + 5
-                y = black_rooks_positions[1][1] * vars.SQUARE_SIZE + 5
-            rook.setPos(x, y)
-            self.scene.addItem(rook)
-
-            # draw the king to new square
-            king = QtWidgets.QGraphicsPixmapItem(
-                self.piece_images[("w" if piece_color == "w" else "b", "K")]
-            )
-            if piece_color == "w":
-                x = white_king_position[0][0] * vars.SQUARE_SIZE + 5
-                y = white_king_position[0][1] * vars.SQUARE_SIZE + 5
-            if piece_color == "b":
-                x = black_king_position[0][0] * vars.SQUARE_SIZE + 5
-                y = black_king_position[0][1] * vars.SQUARE_SIZE + 5
-
-            if white_king_position == white_king_position_before_castling:
-                pass
-            elif black_king_position == black_king_position_before_castling:
-                pass
-            else:
-                king.setPos(x, y)
-                self.scene.addItem(king)
-
-            self.chessboard.move_manager.is_kingside_castling = False
-
-        # check if the move is queenside castling
-        if self.chessboard.move_manager.is_queenside_castling == True:
-            # delete the rook from old square
-            if piece_color == "w":
-                self.delete_piece(white_rooks_positions_before_castling[0])
-            if piece_color == "b":
-                self.delete_piece(black_rooks_positions_before_castling[0])
-
-            # draw the rook to new square
-            rook = QtWidgets.QGraphicsPixmapItem(
-                self.piece_images[("w" if piece_color == "w" else "b", "R")]
-            )
-            if piece_color == "w":
-                x = white_rooks_positions[0][0] * vars.SQUARE_SIZE + 5
-                y = white_rooks_positions[0][1] * vars.SQUARE_SIZE + 5
-            if piece_color == "b":
-                x = black_rooks_positions[0][0] * vars.SQUARE_SIZE + 5
-                y = black_rooks_positions[0][1] * vars.SQUARE_SIZE + 5
-            rook.setPos(x, y)
-            self.scene.addItem(rook)
-
-            # draw the king to new square
-            king = QtWidgets.QGraphicsPixmapItem(
-                self.piece_images[("w" if piece_color == "w" else "b", "K")]
-            )
-            if piece_color == "w":
-                x = white_king_position[0][0] * vars.SQUARE_SIZE + 5
-                y = white_king_position[0][1] * vars.SQUARE_SIZE + 5
-            if piece_color == "b":
-                x = black_king_position[0][0] * vars.SQUARE_SIZE + 5
-                y = black_king_position[0][1] * vars.SQUARE_SIZE + 5
-
-            if white_king_position == white_king_position_before_castling:
-                pass
-            elif black_king_position == black_king_position_before_castling:
-                pass
-            else:
-                king.setPos(x, y)
-                self.scene.addItem(king)
+    def place_piece_item(self, piece_item, square):
+        """
+        moves the piece item to the given square & registers it there
+        """
+        _, _, x, y = self.chessboard.get_square_coordinates(square)
+        piece_item.setPos(x + 5, y + 5)
+        self.piece_items[square] = piece_item
 
-            self.chessboard.move_manager.is_queenside_castling = False
+    @profiled("update_pieces")
+    def update_pieces(self, changes):
+        """
+        reconciles the scene with the board, given the changed squares of a
+        move as {square: (piece_before, piece_after)}.
+        only the items on changed squares are moved, added or removed, which
+        covers captures, en-passant, promotion & (chess960) castling alike
+        """
+        vacated_items = {}
+        for square, (piece_before, _) in changes.items():
+            item = self.piece_items.pop(square, None)
+            if item is not None:
+                vacated_items.setdefault(piece_before, []).append(item)
+
+        for square, (_, piece_after) in changes.items():
+            if piece_after is None:
+                continue
+            if vacated_items.get(piece_after):
+                # same piece left another square, so it is the one that moved
+                self.place_piece_item(vacated_items[piece_after].pop(), square)
+            else:
+                self.draw_piece(piece_after, square)
 
-        # check if the move is an en-passant capture
-        if self.chessboard.move_manager.is_ep:
-            # delete opponent's pawn from the scene at the square
-            self.delete_piece(ep_pawn_square)
-            self.chessboard.move_manager.is_ep = False
+        # whatever is left was captured (or promoted)
+        for items in vacated_items.values():
+            for item in items:
+                self.scene.removeItem(item)
@@ -0,0 +1,328 @@
+"""
+renders board diagrams to PNG or SVG files in bulk, without any window, from
+a file of FENs (one per line) or the games of a PGN file:
+
+    python diagramexport.py positions.txt diagrams/
+    python diagramexport.py games.pgn diagrams/ --ply all --format svg
+"""
+
+import argparse
+import base64
+import concurrent.futures
+import os
+import sys
+import time
+
+import chess.pgn
+
+import piececache
+import vars
+
+# the application & renderer of the worker process, set up by init_worker
+APPLICATION = None
+RENDERER = None
+
+
+class DiagramRenderer:
+    """
+    draws diagrams of a given size & piece set, the pieces being rasterized
+    (or read as svg) once & reused by all the diagrams of the process
+    """
+
+    def __init__(self, piece_set, size, image_format, show_labels):
+        self.piece_set = piece_set
+        self.size = size
+        self.image_format = image_format
+        self.show_labels = show_labels
+        if image_format == "png":
+            # the pieces are drawn the way ChessPieces lays them out
+            piece_size = vars.SQUARE_SIZE - 10
+            self.scale = size / (vars.SQUARE_SIZE * 8)
+            self.piece_images = piececache.load_piece_image_data(
+                piece_set, piececache.get_pixel_size(piece_size, self.scale)
+            )
+        else:
+            self.svg_pieces = {}
+            for piece_color in piececache.PIECE_COLORS:
+                for piece_name in piececache.PIECE_NAMES:
+                    with open(
+                        piececache.get_piece_image_path(
+                            piece_set, piece_color, piece_name
+                        ),
+                        "rb",
+                    ) as svg_file:
+                        self.svg_pieces[(piece_color, piece_name)] = base64.b64encode(
+                            svg_file.read()
+                        ).decode("ascii")
+
+    def render(self, board, is_board_flipped):
+        """
+        returns the diagram of a chess.Board as the bytes of its file
+        """
+        if self.image_format == "png":
+            return self.render_png(board, is_board_flipped)
+        return self.render_svg(board, is_board_flipped).encode("utf-8")
+
+    def render_png(self, board, is_board_flipped):
+        # QtGui is only needed by the workers, once their application exists
+        from PySide6 import QtCore, QtGui
+
+        from boardlayer import draw_labels, draw_squares
+
+        image = QtGui.QImage(self.size, self.size, QtGui.QImage.Format_RGB32)
+        painter = QtGui.QPainter(image)
+        painter.scale(self.scale, self.scale)
+        painter.setRenderHints(
+            QtGui.QPainter.Antialiasing | QtGui.QPainter.SmoothPixmapTransform
+        )
+        draw_squares(painter, vars.SQUARE_SIZE)
+        if self.show_labels:
+            draw_labels(painter, is_board_flipped, vars.SQUARE_SIZE)
+        for square, piece in board.piece_map().items():
+            x, y = get_square_position(square, is_board_flipped)
+            painter.drawImage(
+                QtCore.QRectF(
+                    x + 5, y + 5, vars.SQUARE_SIZE - 10, vars.SQUARE_SIZE - 10
+                ),
+                self.piece_images[get_piece_key(piece)],
+            )
+        painter.end()
+
+        byte_array = QtCore.QByteArray()
+        buffer = QtCore.QBuffer(byte_array)
+        buffer.open(QtCore.QIODevice.WriteOnly)
+        image.save(buffer, "PNG")
+        return byte_array.data()
+
+    def render_svg(self, board, is_board_flipped):
+        square_size = vars.SQUARE_SIZE
+        lines = [
+            '<svg xmlns="http://www.w3.org/2000/svg"'
+            ' xmlns:xlink="http://www.w3.org/1999/xlink"'
+            f' width="{self.size}" height="{self.size}"'
+            f' viewBox="0 0 {square_size * 8} {square_size * 8}">'
+        ]
+        # every piece on the board is embedded once, then referenced
+        lines.append("<defs>")
+        for key in sorted(set(map(get_piece_key, board.piece_map().values()))):
+            lines.append(
+                f'<image id="{"".join(key)}" width="{square_size - 10}"'
+                f' height="{square_size - 10}"'
+                f' xlink:href="data:image/svg+xml;base64,{self.svg_pieces[key]}"/>'
+            )
+        lines.append("</defs>")
+        for row in range(8):
+            for col in range(8):
+                color = vars.THEME_COLORS[
+                    "light_square" if (row + col) % 2 == 0 else "dark_square"
+                ]
+                lines.append(
+                    f'<rect x="{col * square_size}" y="{row * square_size}"'
+                    f' width="{square_size}" height="{square_size}" fill="{color}"/>'
+                )
+        if self.show_labels:
+            lines.extend(get_svg_labels(is_board_flipped))
+        for square, piece in board.piece_map().items():
+            x, y = get_square_position(square, is_board_flipped)
+            lines.append(
+                f'<use xlink:href="#{"".join(get_piece_key(piece))}"'
+                f' x="{x + 5}" y="{y + 5}"/>'
+            )
+        lines.append("</svg>")
+        return "\n".join(lines) + "\n"
+
+
+def get_piece_key(piece):
+    """
+    returns the (piece_color, piece_name) of a chess.Piece, as piececache
+    names its images
+    """
+    return ("w" if piece.color == chess.WHITE else "b", piece.symbol().upper())
+
+
+def get_square_position(square, is_board_flipped):
+    """
+    returns the scene coordinates of the top left corner of a square
+    """
+    if is_board_flipped:
+        col = 7 - chess.square_file(square)
+        row = chess.square_rank(square)
+    else:
+        col = chess.square_file(square)
+        row = 7 - chess.square_rank(square)
+    return col * vars.SQUARE_SIZE, row * vars.SQUARE_SIZE
+
+
+def get_svg_labels(is_board_flipped):
+    """
+    returns the svg text elements of the rank & file labels
+    """
+    square_size = vars.SQUARE_SIZE
+    labels = []
+    for index in range(8):
+        file_name = chess.FILE_NAMES[7 - index if is_board_flipped else index]
+        rank_name = str(index + 1 if is_board_flipped else 8 - index)
+        # drawn in the color of the other squares, as on the board layer
+        file_color = vars.THEME_COLORS[
+            "light_square" if (7 + index) % 2 != 0 else "dark_square"
+        ]
+        rank_color = vars.THEME_COLORS[
+            "light_square" if index % 2 != 0 else "dark_square"
+        ]
+        labels.append(
+            f'<text x="{(index + 1) * square_size - 4}" y="{8 * square_size - 4}"'
+            f' font-size="12" text-anchor="end" fill="{file_color}">{file_name}</text>'
+        )
+        labels.append(
+            f'<text x="4" y="{index * square_size + 14}" font-size="12"'
+            f' fill="{rank_color}">{rank_name}</text>'
+        )
+    return labels
+
+
+def init_worker(piece_set, size, image_format, show_labels):
+    """
+    sets up a worker process: its (windowless) application & renderer
+    """
+    global APPLICATION, RENDERER
+    if image_format == "png":
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6 import QtGui
+
+        # painting text needs an application, even without any window
+        APPLICATION = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+    RENDERER = DiagramRenderer(piece_set, size, image_format, show_labels)
+
+
+def export_diagram(task):
+    """
+    renders a (path, fen, is_board_flipped) diagram in a worker process
+    """
+    path, fen, is_board_flipped = task
+    board = chess.Board(fen)
+    with open(path, "wb") as diagram_file:
+        diagram_file.write(RENDERER.render(board, is_board_flipped))
+    return path
+
+
+def read_fens(path):
+    """
+    yields (name, fen) of the FENs of a text file, one per line. the lines
+    that aren't valid FENs are reported (on stderr) & skipped, rather than
+    failing the whole export in a worker
+    """
+    with open(path, encoding="utf-8") as fen_file:
+        for line_number, line in enumerate(fen_file, 1):
+            fen = line.strip()
+            if not fen or fen.startswith("#"):
+                continue
+            try:
+                chess.Board(fen)
+            except ValueError as error:
+                print(f"{path}:{line_number}: skipped, {error}", file=sys.stderr)
+                continue
+            yield f"{line_number:06d}", fen
+
+
+def read_pgn_positions(path, ply):
+    """
+    yields (name, fen) of the positions of the games of a PGN file, at the
+    given ply ("end", "all" or a number)
+    """
+    with open(path, encoding="utf-8", errors="replace") as pgn_file:
+        game_number = 0
+        while True:
+            game = chess.pgn.read_game(pgn_file)
+            if game is None:
+                break
+            game_number += 1
+            board = game.board()
+            moves = list(game.mainline_moves())
+            if ply == "all":
+                plies = range(len(moves) + 1)
+            elif ply == "end":
+                plies = [len(moves)]
+            else:
+                plies = [min(int(ply), len(moves))]
+            current_ply = 0
+            for target_ply in plies:
+                while current_ply < target_ply:
+                    board.push(moves[current_ply])
+                    current_ply += 1
+                yield f"{game_number:06d}-{target_ply:03d}", board.fen()
+
+
+def export_diagrams(
+    source,
+    output_dir,
+    image_format="png",
+    size=400,
+    piece_set="cardinal",
+    ply="end",
+    is_board_flipped=False,
+    show_labels=True,
+    jobs=None,
+):
+    """
+    renders the diagrams of a FEN list or PGN file into output_dir, spread
+    over a pool of processes. returns the number of diagrams written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if source.lower().endswith(".pgn"):
+        positions = read_pgn_positions(source, ply)
+    else:
+        positions = read_fens(source)
+    tasks = [
+        (os.path.join(output_dir, f"{name}.{image_format}"), fen, is_board_flipped)
+        for name, fen in positions
+    ]
+    if not tasks:
+        return 0
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(piece_set, size, image_format, show_labels),
+    ) as executor:
+        # large chunks, so that the workers aren't waiting on the queue
+        chunk_size = max(1, min(64, len(tasks) // (jobs * 4)))
+        for _ in executor.map(export_diagram, tasks, chunksize=chunk_size):
+            pass
+    return len(tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="renders board diagrams in bulk")
+    parser.add_argument("source", help="text file of FENs, or PGN file")
+    parser.add_argument("output_dir", help="directory the diagrams are written to")
+    parser.add_argument("--format", choices=["png", "svg"], default="png")
+    parser.add_argument("--size", type=int, default=400, help="in pixels")
+    parser.add_argument(
+        "--piece-set",
+        default="cardinal",
+        choices=sorted(os.listdir(vars.PIECES_DIR)),
+    )
+    parser.add_argument(
+        "--ply", default="end", help='position of PGN games: "end", "all" or a ply'
+    )
+    parser.add_argument("--flip", action="store_true", help="black at the bottom")
+    parser.add_argument("--no-labels", action="store_true")
+    parser.add_argument("--jobs", type=int, help="processes (all cores by default)")
+    args = parser.parse_args()
+    if args.ply not in ("end", "all") and not args.ply.isdigit():
+        parser.error('--ply must be "end", "all" or a number')
+
+    start_time = time.perf_counter()
+    count = export_diagrams(
+        args.source,
+        args.output_dir,
+        args.format,
+        args.size,
+        args.piece_set,
+        args.ply,
+        args.flip,
+        not args.no_labels,
+        args.jobs,
+    )
+    elapsed = time.perf_counter() - start_time
+    print(f"{count} diagrams in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f}/s)")
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+
+import chess
+import chess.engine
+from PySide6 import QtCore
+
+import vars
+
+
+class EngineAnalysis(QtCore.QObject):
+    """
+    analyses the positions of a board with a UCI engine, from an asyncio loop
+    running on a worker thread. the engine's info lines are merged there &
+    handed over to the GUI at most every vars.ENGINE_INFO_INTERVAL ms, so a
+    chatty engine can't flood the event loop
+    """
+
+    info_updated = QtCore.Signal(str)  # summary of the merged info, see format_info
+    failed = QtCore.Signal(str)
+
+    def __init__(self, engine_command, parent=None):
+        super().__init__(parent)
+        self.engine_command = engine_command
+        # the position to analyse & what the engine said about it so far,
+        # shared with the worker thread
+        self.lock = threading.Lock()
+        self.board = None
+        self.info = {}
+        self.is_info_changed = False
+        self.is_stopped = False
+        # created by the worker thread
+        self.loop = None
+        self.position_changed = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.info_timer = QtCore.QTimer(self)
+        self.info_timer.setInterval(vars.ENGINE_INFO_INTERVAL)
+        self.info_timer.timeout.connect(self.emit_info)
+
+    def start(self, board):
+        self.board = board.copy()
+        self.thread.start()
+        self.info_timer.start()
+
+    def stop(self):
+        self.is_stopped = True
+        self.info_timer.stop()
+        self.wake_up()
+        self.thread.join()
+
+    def set_position(self, board):
+        """
+        restarts the analysis from the given position
+        """
+        with self.lock:
+            self.board = board.copy()
+            self.info = {}
+            self.is_info_changed = True
+        self.wake_up()
+
+    def wake_up(self):
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.position_changed.set)
+            except RuntimeError:
+                pass  # the worker thread just ended (the engine failed)
+
+    def emit_info(self):
+        with self.lock:
+            if not self.is_info_changed:
+                return
+            board, info = self.board, dict(self.info)
+            self.is_info_changed = False
+        self.info_updated.emit(format_info(board, info))
+
+    def run(self):
+        asyncio.run(self.analyse())
+
+    async def analyse(self):
+        self.position_changed = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        try:
+            _, engine = await chess.engine.popen_uci(self.engine_command)
+        except (OSError, chess.engine.EngineError) as error:
+            self.loop = None
+            self.failed.emit(str(error))
+            return
+        try:
+            while not self.is_stopped:
+                self.position_changed.clear()
+                with self.lock:
+                    board = self.board
+                with await engine.analysis(board) as analysis:
+                    reader = asyncio.ensure_future(self.read_info(board, analysis))
+                    await self.position_changed.wait()
+                    analysis.stop()
+                    await reader
+            await engine.quit()
+        except chess.engine.EngineError as error:
+            self.loop = None
+            self.failed.emit(str(error))
+
+    async def read_info(self, board, analysis):
+        async for info in analysis:
+            with self.lock:
+                if self.board is not board:
+                    break  # the position changed meanwhile
+                self.info.update(info)
+                self.is_info_changed = True
+
+
+def format_info(board, info):
+    """
+    returns a one line summary of an engine's info: depth, score (from
+    white's point of view) & the start of the principal variation
+    """
+    parts = []
+    if "depth" in info:
+        parts.append(f"depth {info['depth']}")
+    if "score" in info:
+        score = info["score"].white()
+        if score.is_mate():
+            parts.append(f"#{score.mate()}")
+        else:
+            parts.append(f"{score.score() / 100:+.2f}")
+    if info.get("pv"):
+        parts.append(board.variation_san(info["pv"][: vars.ENGINE_PV_LENGTH]))
+    return "  ".join(parts)
@@ -0,0 +1,226 @@
+import math
+import re
+import time
+
+import chess
+from PySide6 import QtCore
+
+import vars
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_TENTH = NS_PER_SECOND // 10
+
+# a period of a time control: [moves/]seconds[+increment][d delay]
+PERIOD_PATTERN = re.compile(
+    r"(?:(\d+)/)?(\d+(?:\.\d+)?)(?:\+(\d+(?:\.\d+)?))?(?:d(\d+(?:\.\d+)?))?"
+)
+
+
+class TimeControlPeriod:
+    """
+    a period of a time control: its time, added when it starts, the moves it
+    lasts (None until the end of the game), & the increment/delay of every
+    move
+    """
+
+    def __init__(self, seconds, increment=0, delay=0, moves=None):
+        self.time_ns = round(seconds * NS_PER_SECOND)
+        self.increment_ns = round(increment * NS_PER_SECOND)
+        # the clock only starts running once the delay of a move is over
+        self.delay_ns = round(delay * NS_PER_SECOND)
+        self.moves = moves
+
+
+def parse_time_control(text):
+    """
+    returns the TimeControlPeriods of a time control, written as in the
+    TimeControl tag of PGN games (& "d" for a delay), e.g. "300+2",
+    "40/5400+30:1800+30" or "180d2". raises ValueError if it isn't one
+    """
+    periods = []
+    for period_text in text.strip().split(":"):
+        match = PERIOD_PATTERN.fullmatch(period_text)
+        if match is None:
+            raise ValueError(f"invalid time control period: {period_text!r}")
+        moves, seconds, increment, delay = match.groups()
+        periods.append(
+            TimeControlPeriod(
+                float(seconds),
+                float(increment or 0),
+                float(delay or 0),
+                int(moves) if moves else None,
+            )
+        )
+    return periods
+
+
+def format_clock_time(time_ns):
+    """
+    returns a remaining time the way a clock shows it: [h:]mm:ss, & seconds
+    with tenths in low time
+    """
+    time_ns = max(0, time_ns)
+    if time_ns <= vars.CLOCK_LOW_TIME * NS_PER_SECOND:
+        tenths = time_ns // NS_PER_TENTH
+        return f"{tenths // 10}.{tenths % 10}"
+    minutes, seconds = divmod(time_ns // NS_PER_SECOND, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class ChessClock(QtCore.QObject):
+    """
+    the clocks of both players. the time is read from time.monotonic_ns &
+    charged when a move gets committed, a single-shot timer only waking the
+    clock when its display changes (the next second, or tenth in low time)
+    or when the player to move runs out of time
+    """
+
+    changed = QtCore.Signal()  # the times shown changed
+    flagged = QtCore.Signal(bool)  # color of the player out of time
+
+    def __init__(self, periods, parent=None):
+        super().__init__(parent)
+        self.periods = periods
+        self.remaining_ns = {
+            chess.WHITE: periods[0].time_ns,
+            chess.BLACK: periods[0].time_ns,
+        }
+        self.period_indexes = {chess.WHITE: 0, chess.BLACK: 0}
+        self.period_moves = {chess.WHITE: 0, chess.BLACK: 0}
+        self.turn = chess.WHITE
+        # time.monotonic_ns() the turn started at, None while stopped
+        self.turn_start_ns = None
+        self.flagged_color = None
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def start(self, turn):
+        """
+        starts the clock of the given player
+        """
+        if self.flagged_color is not None:
+            return
+        self.turn = turn
+        self.turn_start_ns = time.monotonic_ns()
+        self.schedule(self.turn_start_ns)
+        self.changed.emit()
+
+    def stop(self):
+        if self.turn_start_ns is None:
+            return
+        now_ns = time.monotonic_ns()
+        self.remaining_ns[self.turn] = self.get_remaining_ns(self.turn, now_ns)
+        self.turn_start_ns = None
+        self.timer.stop()
+        self.changed.emit()
+
+    def is_running(self):
+        return self.turn_start_ns is not None
+
+    def get_period(self, color):
+        return self.periods[self.period_indexes[color]]
+
+    def get_remaining_ns(self, color, now_ns=None):
+        """
+        returns the time left to a player, as of now (or now_ns)
+        """
+        remaining_ns = self.remaining_ns[color]
+        if color == self.turn and self.turn_start_ns is not None:
+            if now_ns is None:
+                now_ns = time.monotonic_ns()
+            elapsed_ns = now_ns - self.turn_start_ns
+            remaining_ns -= max(0, elapsed_ns - self.get_period(color).delay_ns)
+        return remaining_ns
+
+    def commit_move(self):
+        """
+        charges the time of the move being committed to the player to move,
+        adds its increment & starts the clock of the opponent. returns False
+        if the player ran out of time before the move (which is refused)
+        """
+        if self.flagged_color is not None:
+            return False
+        if self.turn_start_ns is None:
+            return True
+        now_ns = time.monotonic_ns()
+        color = self.turn
+        remaining_ns = self.get_remaining_ns(color, now_ns)
+        if remaining_ns <= 0:
+            self.flag()
+            return False
+        period = self.get_period(color)
+        remaining_ns += period.increment_ns
+        self.period_moves[color] += 1
+        if period.moves is not None and self.period_moves[color] == period.moves:
+            # the next period starts (the last one repeats)
+            self.period_indexes[color] = min(
+                self.period_indexes[color] + 1, len(self.periods) - 1
+            )
+            self.period_moves[color] = 0
+            remaining_ns += self.get_period(color).time_ns
+        self.remaining_ns[color] = remaining_ns
+        self.turn = not color
+        self.turn_start_ns = now_ns
+        self.schedule(now_ns)
+        self.changed.emit()
+        return True
+
+    def sync(self, board):
+        """
+        follows the board after any change (a move, or the position getting
+        undone, jumped through or replaced): only the clock of the player to
+        move runs, & neither once the game is over
+        """
+        if self.flagged_color is not None:
+            return
+        if board.is_game_over():
+            self.stop()
+        elif not self.is_running() or board.turn != self.turn:
+            self.stop()
+            self.start(board.turn)
+
+    def schedule(self, now_ns):
+        """
+        sets the timer to the next change of the time shown by the clock
+        running, which is also when it flags
+        """
+        remaining_ns = self.get_remaining_ns(self.turn, now_ns)
+        delay_left_ns = max(
+            0, self.turn_start_ns + self.get_period(self.turn).delay_ns - now_ns
+        )
+        resolution_ns = (
+            NS_PER_TENTH
+            if remaining_ns <= vars.CLOCK_LOW_TIME * NS_PER_SECOND
+            else NS_PER_SECOND
+        )
+        # the time shown is rounded down, so it changes (or the flag falls)
+        # as soon as the time left reaches the previous multiple
+        until_change_ns = remaining_ns % resolution_ns or resolution_ns
+        if remaining_ns <= 0:
+            until_change_ns = 0
+        # rounded up, a timer waking up early would only have to sleep again
+        self.timer.start(math.ceil((delay_left_ns + until_change_ns) / 1_000_000))
+
+    def on_timeout(self):
+        now_ns = time.monotonic_ns()
+        if self.get_remaining_ns(self.turn, now_ns) <= 0:
+            self.flag()
+            return
+        self.schedule(now_ns)
+        self.changed.emit()
+
+    def flag(self):
+        """
+        stops the clock, the player to move having run out of time
+        """
+        self.remaining_ns[self.turn] = 0
+        self.turn_start_ns = None
+        self.flagged_color = self.turn
+        self.timer.stop()
+        self.changed.emit()
+        self.flagged.emit(self.turn)
@@ -0,0 +1,330 @@
+"""
+crash-safe record of the games played on the boards: every move is appended
+to a journal as it is made, & finished games get moved to a PGN archive in
+the background. each running application has a journal of its own, locked
+while it runs: the games left unfinished in the journals of applications
+that exited or crashed are recovered on the next launch
+"""
+
+import datetime
+import os
+import queue
+import threading
+import uuid
+
+import chess.pgn
+from PySide6 import QtCore
+
+import vars
+
+
+def get_journal_dir():
+    """
+    returns the directory of the journals & of the archive of played games
+    """
+    data_location = QtCore.QStandardPaths.writableLocation(
+        QtCore.QStandardPaths.GenericDataLocation
+    )
+    return os.path.join(data_location, "yacs")
+
+
+class JournalGame:
+    """
+    a game of the journal: its starting position & moves
+    """
+
+    def __init__(self, game_id, fen, chess960, moves):
+        self.game_id = game_id
+        self.fen = fen
+        self.chess960 = chess960
+        self.moves = moves
+
+    def get_starting_board(self):
+        return chess.Board(self.fen, chess960=self.chess960)
+
+
+def read_journal(path):
+    """
+    replays the records of a journal, returns the {game_id: JournalGame} of
+    the games it leaves unfinished, in the order they started
+    """
+    games = {}
+    try:
+        with open(path, encoding="utf-8") as journal_file:
+            for line in journal_file:
+                if not line.endswith("\n"):
+                    break  # torn by a crash in the middle of a write
+                apply_record(games, line.rstrip("\n").split("\t"))
+    except OSError:
+        pass
+    return games
+
+
+def apply_record(games, record):
+    """
+    applies a journal record (the fields of one line) to {game_id: JournalGame}:
+    new <game_id> <fen> <chess960> <uci moves before the first recorded one>
+    move <game_id> <ply> <uci>  (the move is the ply-th, later ones dropped)
+    end <game_id>  (the game got archived)
+    """
+    kind, game_id, *fields = record
+    if kind == "new":
+        fen, chess960, moves = fields
+        games[game_id] = JournalGame(
+            game_id,
+            fen,
+            chess960 == "1",
+            [chess.Move.from_uci(uci) for uci in moves.split()],
+        )
+    elif kind == "move" and game_id in games:
+        ply, uci = fields
+        moves = games[game_id].moves
+        del moves[int(ply) - 1 :]
+        moves.append(chess.Move.from_uci(uci))
+    elif kind == "end":
+        games.pop(game_id, None)
+
+
+def format_record(kind, game_id, *fields):
+    return "\t".join((kind, game_id) + tuple(str(field) for field in fields)) + "\n"
+
+
+def get_journal_lock(journal_path):
+    """
+    returns the QLockFile held by the application writing a journal
+    """
+    lock = QtCore.QLockFile(f"{os.path.splitext(journal_path)[0]}.lock")
+    # only stale once its process is gone, however long a game lasts
+    lock.setStaleLockTime(0)
+    return lock
+
+
+def recover_journals(directory):
+    """
+    locks the journals whose application exited (or crashed), returns the
+    {game_id: JournalGame} they leave unfinished & their [(path, lock)]
+    """
+    games = {}
+    journals = []
+    journal_paths = [
+        os.path.join(directory, file_name)
+        for file_name in os.listdir(directory)
+        if file_name.startswith("journal-") and file_name.endswith(".log")
+    ]
+    # oldest first, so that the games keep the order they started in
+    for journal_path in sorted(journal_paths, key=os.path.getmtime):
+        lock = get_journal_lock(journal_path)
+        if lock.tryLock(0):
+            games.update(read_journal(journal_path))
+            journals.append((journal_path, lock))
+    return games, journals
+
+
+class GameJournal(QtCore.QObject):
+    """
+    appends the moves played on the boards to the journal of the
+    application. the boards only queue records, which a worker thread
+    writes & flushes (batched while moves come faster than the disk), so
+    that saving never pauses the GUI
+    """
+
+    failed = QtCore.Signal(str)  # error of a journal or archive write
+
+    def __init__(self, directory, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.archive_path = os.path.join(directory, "games.pgn")
+        os.makedirs(directory, exist_ok=True)
+        # games left unfinished by applications gone, until resumed or
+        # ended, & the journals they come from (deleted once taken over)
+        self.recovered_games, self.recovered_journals = recover_journals(directory)
+        self.journal_path = os.path.join(directory, f"journal-{uuid.uuid4().hex}.log")
+        self.lock = get_journal_lock(self.journal_path)
+        self.lock.tryLock(0)
+        # BoardCore => JournalGame being recorded from it (moves only read by
+        # the GUI thread, the worker keeping its own copy)
+        self.core_games = {}
+        self.records = queue.Queue()
+        # the worker starts from copies, the recovered games being resumed
+        # by the GUI thread
+        games = {
+            game_id: JournalGame(game.game_id, game.fen, game.chess960, game.moves)
+            for game_id, game in self.recovered_games.items()
+        }
+        self.thread = threading.Thread(target=self.run, args=(games,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """
+        writes the queued records & stops the worker thread, the games
+        still being played are left to be recovered by the next launch
+        """
+        self.records.put(None)
+        self.thread.join()
+        self.lock.unlock()
+
+    def resume(self, core, game_id):
+        """
+        sets a board to a recovered game, whose moves keep being recorded
+        under the same game
+        """
+        game = self.recovered_games.pop(game_id)
+        core.set_game(game.get_starting_board(), game.moves)
+        self.core_games[core] = JournalGame(
+            game_id, game.fen, game.chess960, list(game.moves)
+        )
+
+    def end_recovered_games(self):
+        """
+        archives the recovered games that didn't get resumed
+        """
+        for game_id in self.recovered_games:
+            self.records.put(("end", game_id))
+        self.recovered_games = {}
+
+    def record_move(self, core):
+        """
+        records the move just pushed on a board, starting a new game if it
+        doesn't continue the one recorded from it
+        """
+        ply = core.get_ply()
+        move = core.board.peek()
+        starting_board = core.keyframes[0]
+        game = self.core_games.get(core)
+        if (
+            game is None
+            or game.fen != starting_board.fen()
+            or game.moves[: ply - 1] != core.history[: ply - 1]
+        ):
+            if game is not None:
+                self.records.put(("end", game.game_id))
+            game = JournalGame(
+                uuid.uuid4().hex,
+                starting_board.fen(),
+                starting_board.chess960,
+                core.history[: ply - 1],
+            )
+            self.core_games[core] = game
+            self.records.put(get_new_record(game))
+        del game.moves[ply - 1 :]
+        game.moves.append(move)
+        self.records.put(("move", game.game_id, ply, move.uci()))
+        if core.board.is_game_over():
+            self.records.put(("end", game.game_id))
+            del self.core_games[core]
+
+    def run(self, games):
+        """
+        writes the queued records to the journal, archiving the games that
+        end & compacting the journal whenever it gets long. the journal is
+        rewritten from the games after a write error, so that the records
+        keep being consumed & the journal catches up once writing works again
+        """
+        journal_file = None
+        is_stopping = False
+        while not is_stopping:
+            batch = [self.records.get()]
+            # the records queued meanwhile are written (& synced) together
+            while True:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            records = []
+            for record in batch:
+                if record is None:
+                    is_stopping = True
+                    continue
+                if record[0] == "end" and record[1] in games:
+                    # archived before ending it, so a crash in between can
+                    # at worst archive a game twice, never lose it
+                    try:
+                        append_to_archive(self.archive_path, games[record[1]])
+                    except OSError as error:
+                        # left open, to be archived by a later launch
+                        self.failed.emit(f"Could not archive a game: {error}")
+                        continue
+                apply_record(games, [str(field) for field in record])
+                records.append(record)
+            try:
+                if journal_file is None:
+                    journal_file = compact_journal(self.journal_path, games)
+                    self.remove_recovered_journals()
+                else:
+                    for record in records:
+                        journal_file.write(format_record(*record))
+                    journal_file.flush()
+                    os.fsync(journal_file.fileno())
+                journal_size = journal_file.tell()
+                if (not games and journal_size) or (
+                    journal_size > vars.JOURNAL_COMPACT_SIZE
+                ):
+                    journal_file.close()
+                    journal_file = compact_journal(self.journal_path, games)
+            except OSError as error:
+                self.failed.emit(f"Could not write the game journal: {error}")
+                if journal_file is not None:
+                    try:
+                        journal_file.close()
+                    except OSError:
+                        pass
+                journal_file = None
+        if journal_file is not None:
+            journal_file.close()
+            if not games:
+                os.remove(self.journal_path)  # nothing left to recover
+
+    def remove_recovered_journals(self):
+        """
+        deletes the journals taken over, once their games are in this one
+        """
+        for journal_path, lock in self.recovered_journals:
+            try:
+                os.remove(journal_path)
+            except OSError:
+                pass
+            lock.unlock()
+        self.recovered_journals = []
+
+
+def get_new_record(game):
+    return (
+        "new",
+        game.game_id,
+        game.fen,
+        int(game.chess960),
+        " ".join(move.uci() for move in game.moves),
+    )
+
+
+def append_to_archive(archive_path, game):
+    """
+    appends a journal game to the PGN archive, in a single write so that
+    the games archived by several applications don't get interleaved
+    """
+    board = game.get_starting_board()
+    for move in game.moves:
+        board.push(move)
+    pgn_game = chess.pgn.Game.from_board(board)
+    pgn_game.headers["Event"] = "YACS game"
+    pgn_game.headers["Date"] = datetime.date.today().strftime("%Y.%m.%d")
+    archive_fd = os.open(archive_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(archive_fd, f"{pgn_game}\n\n".encode("utf-8"))
+    finally:
+        os.close(archive_fd)
+
+
+def compact_journal(journal_path, games):
+    """
+    rewrites the journal with only the games still open (nothing at all
+    when they all ended), returns the journal file to append to
+    """
+    tmp_path = f"{journal_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as tmp_file:
+        for game in games.values():
+            tmp_file.write(format_record(*get_new_record(game)))
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_path, journal_path)
+    return open(journal_path, "a", encoding="utf-8")
@@ -0,0 +1,221 @@
+"""
+follows live games written to a PGN file (by a relay, the software of an
+electronic board...) onto boards.
+simulates such a feed, by writing the games of a PGN file move by move:
+
+    python livefeed.py games.pgn live.pgn --moves-per-second 10
+"""
+
+import argparse
+import io
+import os
+import re
+import threading
+import time
+
+import chess.pgn
+from PySide6 import QtCore
+
+import vars
+
+# the empty line before the first tag pair of a game
+GAME_START_PATTERN = re.compile(rb'^[ \t\r]*\n(?=\[[A-Za-z0-9_]+[ \t]+")', re.MULTILINE)
+
+
+def split_pgn_games(data):
+    """
+    returns the bytes of each game of PGN data, cut where its headers start
+    """
+    offsets = [0] + [match.end() for match in GAME_START_PATTERN.finditer(data)]
+    game_datas = [data[start:end] for start, end in zip(offsets, offsets[1:])]
+    game_datas.append(data[offsets[-1] :])
+    return [game_data for game_data in game_datas if game_data.strip()]
+
+
+def parse_pgn_game(game_data):
+    """
+    returns (title, starting board, [moves]) of the bytes of a PGN game
+    """
+    game = chess.pgn.read_game(io.StringIO(game_data.decode("utf-8", errors="replace")))
+    if game is None:
+        game = chess.pgn.Game()
+    headers = game.headers
+    title = (
+        f"{headers.get('White', '?')} - {headers.get('Black', '?')}"
+        f"  {headers.get('Result', '*')}"
+    )
+    return title, game.board(), list(game.mainline_moves())
+
+
+class LiveFeedReader(QtCore.QObject):
+    """
+    polls a PGN file from a worker thread & reports the games that changed.
+    the file is only cut into games (by the offsets of their headers) when
+    it changed, & only the games whose bytes differ from the last read (the
+    ones appended, or rewritten by the relay) get parsed again
+    """
+
+    # {game index: (title, starting board, moves)}, number of games
+    games_updated = QtCore.Signal(object, int)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        file_state = None
+        # the bytes of the games last read & their (title, starting board,
+        # moves)
+        game_datas = []
+        games = []
+        while not self.stop_event.is_set():
+            try:
+                stat = os.stat(self.path)
+                new_file_state = (stat.st_size, stat.st_mtime_ns)
+                if new_file_state != file_state:
+                    file_state = new_file_state
+                    with open(self.path, "rb") as pgn_file:
+                        new_game_datas = split_pgn_games(pgn_file.read())
+                else:
+                    new_game_datas = None
+            except OSError:
+                new_game_datas = None  # not written yet, or being replaced
+            if new_game_datas is not None:
+                changed_games = {}
+                for index, game_data in enumerate(new_game_datas):
+                    if index < len(game_datas) and game_datas[index] == game_data:
+                        continue
+                    game = parse_pgn_game(game_data)
+                    if index < len(games):
+                        games[index] = game
+                    else:
+                        games.append(game)
+                    changed_games[index] = game
+                del games[len(new_game_datas) :]
+                if changed_games or len(new_game_datas) != len(game_datas):
+                    self.games_updated.emit(changed_games, len(games))
+                game_datas = new_game_datas
+            self.stop_event.wait(vars.LIVE_FEED_POLL_INTERVAL / 1000)
+
+
+class LiveFeed(QtCore.QObject):
+    """
+    applies the games of a live PGN file to boards (game n to the board n).
+    the file gets parsed off the GUI thread, & only the latest state of each
+    game is kept until the next frame: a burst of moves is applied (&
+    repainted) once, a board falling behind jumps to the latest position
+    """
+
+    game_count_changed = QtCore.Signal(int)
+    game_changed = QtCore.Signal(int, str)  # index & title of an applied game
+
+    def __init__(self, path, boards=(), parent=None):
+        super().__init__(parent)
+        self.boards = list(boards)
+        # game index => latest (title, starting board, moves) of the feed
+        self.games = {}
+        self.game_count = 0
+        # indexes of the games changed since the last frame
+        self.pending_indexes = set()
+        self.frame_timer = QtCore.QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(vars.LIVE_FEED_FRAME_INTERVAL)
+        self.frame_timer.timeout.connect(self.apply_pending_games)
+        self.reader = LiveFeedReader(path)
+        self.reader.games_updated.connect(self.on_games_updated)
+
+    def start(self):
+        self.reader.start()
+
+    def stop(self):
+        self.reader.stop()
+        self.frame_timer.stop()
+
+    def set_boards(self, boards):
+        """
+        follows the games on other boards, showing their latest state
+        """
+        self.boards = list(boards)
+        self.pending_indexes.update(self.games)
+        self.frame_timer.start()
+
+    def on_games_updated(self, games, game_count):
+        self.games.update(games)
+        self.pending_indexes.update(games)
+        if game_count != self.game_count:
+            self.game_count = game_count
+            self.game_count_changed.emit(game_count)
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    def apply_pending_games(self):
+        for index in sorted(self.pending_indexes):
+            if index < len(self.boards):
+                title, starting_board, moves = self.games[index]
+                apply_game(self.boards[index].core, starting_board, moves)
+                self.game_changed.emit(index, title)
+        self.pending_indexes.clear()
+
+
+def apply_game(core, starting_board, moves):
+    """
+    brings a BoardCore to the latest state of a live game: the next move
+    gets pushed, anything else (several moves, a corrected game...) replaces
+    the game at once. a board looking at an earlier ply stays there
+    """
+    history = core.history
+    at_last_ply = core.get_ply() == len(history)
+    if (
+        at_last_ply
+        and len(moves) == len(history) + 1
+        and moves[:-1] == history
+        and core.keyframes[0].fen() == starting_board.fen()
+    ):
+        core.push(moves[-1])
+    elif moves != history or core.keyframes[0].fen() != starting_board.fen():
+        core.set_game(starting_board, moves, None if at_last_ply else core.get_ply())
+
+
+def simulate_feed(source_path, feed_path, moves_per_second):
+    """
+    rewrites feed_path with the games of source_path, one more move of each
+    game at every step, the way relays rewrite their PGN file
+    """
+    games = []
+    with open(source_path, encoding="utf-8", errors="replace") as pgn_file:
+        while True:
+            game = chess.pgn.read_game(pgn_file)
+            if game is None:
+                break
+            games.append((game.headers, game.board(), list(game.mainline_moves())))
+    max_plies = max((len(moves) for _, _, moves in games), default=0)
+    for ply in range(max_plies + 1):
+        partial_games = []
+        for headers, starting_board, moves in games:
+            partial_game = chess.pgn.Game.from_board(starting_board)
+            partial_game.headers.update(headers)
+            partial_game.add_line(moves[:ply])
+            partial_games.append(str(partial_game))
+        tmp_path = f"{feed_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as feed_file:
+            feed_file.write("\n\n".join(partial_games) + "\n")
+        os.replace(tmp_path, feed_path)
+        time.sleep(1 / moves_per_second)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="simulates a live PGN feed")
+    parser.add_argument("source", help="PGN file of the games to play")
+    parser.add_argument("feed", help="PGN file to write the games to, move by move")
+    parser.add_argument("--moves-per-second", type=float, default=1.0)
+    args = parser.parse_args()
+    simulate_feed(args.source, args.feed, args.moves_per_second)
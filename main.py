@@ -1,7 +1,19 @@
-from chessboard import DrawChessBoard
+import time
+
+# taken before the other imports, so that --startup-profile includes them
+STARTUP_TIME = time.perf_counter()
+
+import argparse
 import sys
-from PySide6 import QtWidgets
+
+import chess
+from PySide6 import QtCore, QtGui, QtWidgets
+
+import piececache
 import vars
+from chessboard import DrawChessBoard
+from gamejournal import GameJournal, get_journal_dir
+from profiler import PROFILER
 
 
 class ApplicationWindow(QtWidgets.QMainWindow):
@@ -13,10 +25,486 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.chess_board = DrawChessBoard()
         self.setCentralWidget(self.chess_board)
         self.chess_board.draw_chessboard()
-        self.chess_board.setFixedSize(vars.SQUARE_SIZE * 8.5, vars.SQUARE_SIZE * 8.5)
+        self.chess_board.setMinimumSize(vars.SQUARE_SIZE * 4, vars.SQUARE_SIZE * 4)
+        self.resize(int(vars.SQUARE_SIZE * 8.5), int(vars.SQUARE_SIZE * 8.5))
+
+        self.pgn_database = None
+        self.position_index = None
+        self.game_journal = None
+        file_menu = self.menuBar().addMenu("&File")
+        file_menu.addAction("&Open PGN database...", self.open_pgn_database)
+        self.load_game_action = file_menu.addAction("&Load game...", self.load_game)
+        self.load_game_action.setEnabled(False)
+        self.find_games_action = file_menu.addAction(
+            "&Find games with this position...", self.find_games_with_position
+        )
+        self.find_games_action.setEnabled(False)
+        self.broadcast_action = file_menu.addAction("&Watch games...", self.watch_games)
+        self.broadcast_action.setEnabled(False)
+        self.broadcast_view = None
+        file_menu.addAction("Follow &live PGN...", self.follow_live_pgn)
+        self.live_feed = None
+        file_menu.addAction("Open opening &book...", self.open_opening_book)
+
+        game_menu = self.menuBar().addMenu("&Game")
+        game_menu.addAction(
+            "&Undo move", QtGui.QKeySequence.Undo, self.chess_board.core.undo
+        )
+        game_menu.addAction(
+            "&Redo move", QtGui.QKeySequence.Redo, self.chess_board.core.redo
+        )
+        game_menu.addSeparator()
+        game_menu.addAction("&Analyse with engine...", self.choose_engine)
+        self.stop_analysis_action = game_menu.addAction(
+            "&Stop analysis", self.stop_analysis
+        )
+        self.stop_analysis_action.setEnabled(False)
+        self.engine_analysis = None
+        game_menu.addSeparator()
+        game_menu.addAction("Start &clocks...", self.choose_time_control)
+        self.stop_clocks_action = game_menu.addAction("Stop c&locks", self.stop_clocks)
+        self.stop_clocks_action.setEnabled(False)
+        self.chess_clock = None
+        self.clock_labels = {}
+        for color in chess.COLORS:
+            self.clock_labels[color] = QtWidgets.QLabel()
+            self.statusBar().addPermanentWidget(self.clock_labels[color])
+        self.analysis_label = QtWidgets.QLabel()
+        self.statusBar().addPermanentWidget(self.analysis_label)
+
+        view_menu = self.menuBar().addMenu("&View")
+        piece_set_menu = view_menu.addMenu("Piece &set")
+        piece_set_group = QtGui.QActionGroup(self)
+        for piece_set in piececache.get_piece_sets():
+            action = piece_set_menu.addAction(piece_set.capitalize())
+            action.setCheckable(True)
+            action.setChecked(piece_set == vars.PIECE_SET)
+            action.triggered.connect(
+                lambda checked=False, piece_set=piece_set: self.set_piece_set(piece_set)
+            )
+            piece_set_group.addAction(action)
+        theme_menu = view_menu.addMenu("&Theme")
+        theme_group = QtGui.QActionGroup(self)
+        for theme, colors in vars.BOARD_THEMES.items():
+            action = theme_menu.addAction(theme.capitalize())
+            action.setCheckable(True)
+            action.setChecked(
+                all(vars.THEME_COLORS[key] == color for key, color in colors.items())
+            )
+            action.triggered.connect(
+                lambda checked=False, theme=theme: self.set_theme(theme)
+            )
+            theme_group.addAction(action)
+        view_menu.addSeparator()
+        heatmap_action = view_menu.addAction("Show attack &heatmap")
+        heatmap_action.setCheckable(True)
+        heatmap_action.toggled.connect(self.chess_board.set_attack_heatmap)
+        profiling_action = view_menu.addAction("Show &profiling overlay")
+        profiling_action.setCheckable(True)
+        profiling_action.setChecked(PROFILER.enabled)
+        profiling_action.toggled.connect(self.chess_board.set_profiling)
+        view_menu.addAction("Save profiling &trace...", self.save_profiling_trace)
+
+    def get_boards(self):
+        """
+        returns the boards shown: the main board & those of the broadcast grid
+        """
+        boards = [self.chess_board]
+        if self.broadcast_view is not None:
+            boards.extend(self.broadcast_view.boards)
+        return boards
+
+    def set_piece_set(self, piece_set):
+        vars.PIECE_SET = piece_set
+        for board in self.get_boards():
+            board.set_piece_set(piece_set)
+
+    def set_theme(self, theme):
+        """
+        recolors the squares of the boards, the board layer of the theme
+        being rendered once for all of them
+        """
+        vars.THEME_COLORS.update(vars.BOARD_THEMES[theme])
+        for board in self.get_boards():
+            board.update_board_layer()
+
+    def save_profiling_trace(self):
+        """
+        saves the recorded timings as a chrome trace JSON file
+        """
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Save profiling trace", "yacs-trace.json", "JSON files (*.json)"
+        )
+        if path:
+            PROFILER.dump_chrome_trace(path)
+
+    def open_pgn_database(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Open PGN database", "", "PGN files (*.pgn);;All files (*)"
+        )
+        if not path:
+            return
+        if self.pgn_database is not None:
+            self.pgn_database.close()
+        if self.position_index is not None:
+            self.position_index.close()
+            self.position_index = None
+        self.stop_live_feed()
+        self.close_broadcast_view()
+        from pgndatabase import PgnDatabase  # not needed until a PGN is opened
+
+        self.pgn_database = PgnDatabase(path)
+        self.load_game_action.setEnabled(len(self.pgn_database) > 0)
+        self.find_games_action.setEnabled(len(self.pgn_database) > 0)
+        self.broadcast_action.setEnabled(len(self.pgn_database) > 0)
+        if len(self.pgn_database) > 0:
+            self.load_game()
+
+    def load_game(self):
+        game_count = len(self.pgn_database)
+        game_number, ok = QtWidgets.QInputDialog.getInt(
+            self, "Load game", f"Game (1-{game_count}):", 1, 1, game_count
+        )
+        if ok:
+            self.show_game(game_number - 1)
+
+    def show_game(self, game_id, ply=None):
+        """
+        loads a game of the opened PGN database on the board
+        """
+        self.chess_board.load_game(self.pgn_database.read_game(game_id), ply)
+        headers = self.pgn_database.get_headers(game_id)
+        self.statusBar().showMessage(
+            f"{headers['White']} - {headers['Black']}  {headers['Result']}"
+            f"  ({headers['Date']})"
+        )
+
+    def watch_games(self):
+        """
+        shows the final positions of the first games of the opened PGN
+        database side by side, double clicking one loads it on the board
+        """
+        from broadcastview import BroadcastView  # not needed until then
+
+        game_count = min(len(self.pgn_database), vars.BROADCAST_MAX_BOARDS)
+        self.stop_live_feed()
+        self.close_broadcast_view()
+        self.broadcast_view = BroadcastView(game_count)
+        for game_id in range(game_count):
+            headers = self.pgn_database.get_headers(game_id)
+            self.broadcast_view.set_game(
+                game_id,
+                self.pgn_database.read_game(game_id),
+                title=f"{headers['White']} - {headers['Black']}  {headers['Result']}",
+            )
+        self.broadcast_view.board_activated.connect(self.show_game)
+        self.broadcast_view.show()
+
+    def close_broadcast_view(self):
+        if self.broadcast_view is not None:
+            self.broadcast_view.close()
+            self.broadcast_view.deleteLater()
+            self.broadcast_view = None
+
+    def follow_live_pgn(self):
+        """
+        follows the games of a PGN file written live (by a relay...), on the
+        board if there's a single one, in a broadcast grid otherwise
+        """
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Follow live PGN", "", "PGN files (*.pgn);;All files (*)"
+        )
+        if not path:
+            return
+        from livefeed import LiveFeed  # not needed until a feed is followed
+
+        self.stop_live_feed()
+        self.close_broadcast_view()
+        self.live_feed = LiveFeed(path, [self.chess_board])
+        self.live_feed.game_count_changed.connect(self.show_live_games)
+        self.live_feed.game_changed.connect(self.show_live_game_title)
+        self.live_feed.start()
+
+    def show_live_games(self, game_count):
+        """
+        moves the live games to a broadcast grid, as soon as there's more
+        than one (or more than the grid shows)
+        """
+        board_count = min(game_count, vars.BROADCAST_MAX_BOARDS)
+        if board_count <= 1 or (
+            self.broadcast_view is not None
+            and len(self.broadcast_view.boards) == board_count
+        ):
+            return
+        self.close_broadcast_view()
+        from broadcastview import BroadcastView
+
+        self.broadcast_view = BroadcastView(board_count)
+        self.live_feed.set_boards(self.broadcast_view.boards)
+        self.broadcast_view.show()
+
+    def show_live_game_title(self, index, title):
+        if self.broadcast_view is not None:
+            self.broadcast_view.set_title(index, title)
+        else:
+            self.statusBar().showMessage(title)
+
+    def stop_live_feed(self):
+        if self.live_feed is not None:
+            self.live_feed.stop()
+            self.live_feed = None
+
+    def open_opening_book(self):
+        """
+        hints the moves of a Polyglot book when selecting a piece
+        """
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Open opening book", "", "Polyglot books (*.bin);;All files (*)"
+        )
+        if not path:
+            return
+        from openingbook import OpeningBook  # not needed until a book is opened
+
+        try:
+            opening_book = OpeningBook(path)
+        except OSError as error:
+            self.statusBar().showMessage(f"Could not open the opening book: {error}")
+            return
+        self.close_opening_book()
+        self.chess_board.opening_book = opening_book
+
+    def close_opening_book(self):
+        if self.chess_board.opening_book is not None:
+            self.chess_board.opening_book.close()
+            self.chess_board.opening_book = None
+
+    def choose_time_control(self):
+        time_control, ok = QtWidgets.QInputDialog.getText(
+            self,
+            "Start clocks",
+            'Time control (e.g. "300+3", "40/5400+30:1800+30", "180d2"):',
+            text=vars.DEFAULT_TIME_CONTROL,
+        )
+        if ok:
+            try:
+                self.start_clocks(time_control)
+            except ValueError as error:
+                self.statusBar().showMessage(f"Invalid time control: {error}")
+
+    def start_clocks(self, time_control):
+        """
+        starts the clocks of a time control (see gameclock.parse_time_control)
+        for the player to move, charged for each move played on the board
+        """
+        from gameclock import ChessClock, parse_time_control
+
+        periods = parse_time_control(time_control)
+        self.stop_clocks()
+        self.chess_clock = ChessClock(periods, self)
+        self.chess_clock.changed.connect(self.show_clocks)
+        self.chess_clock.flagged.connect(self.on_flagged)
+        self.chess_board.move_manager.clock = self.chess_clock
+        self.chess_board.core.subscribe(self.on_clocked_board_change)
+        self.chess_clock.sync(self.chess_board.board)
+        self.stop_clocks_action.setEnabled(True)
+
+    def stop_clocks(self):
+        if self.chess_clock is not None:
+            self.chess_board.core.unsubscribe(self.on_clocked_board_change)
+            self.chess_clock.stop()
+            self.chess_clock.deleteLater()
+            self.chess_clock = None
+            self.chess_board.move_manager.clock = None
+            for label in self.clock_labels.values():
+                label.clear()
+            self.stop_clocks_action.setEnabled(False)
+
+    def on_clocked_board_change(self, board_change):
+        self.chess_clock.sync(self.chess_board.board)
+
+    def show_clocks(self):
+        from gameclock import format_clock_time
+
+        for color, label in self.clock_labels.items():
+            text = (
+                f"{chess.COLOR_NAMES[color].capitalize()} "
+                f"{format_clock_time(self.chess_clock.get_remaining_ns(color))}"
+            )
+            # the clock running is in bold
+            if color == self.chess_clock.turn and self.chess_clock.is_running():
+                text = f"<b>{text}</b>"
+            label.setText(text)
+
+    def on_flagged(self, color):
+        self.statusBar().showMessage(
+            f"{chess.COLOR_NAMES[color].capitalize()} ran out of time"
+        )
+
+    def choose_engine(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Choose a UCI engine")
+        if path:
+            self.start_analysis(path)
+
+    def start_analysis(self, engine_command):
+        """
+        analyses the positions of the board with a UCI engine (a path, or a
+        command line as a list), until stop_analysis
+        """
+        from engineanalysis import EngineAnalysis  # not needed until then
+
+        self.stop_analysis()
+        self.engine_analysis = EngineAnalysis(engine_command, self)
+        self.engine_analysis.info_updated.connect(self.analysis_label.setText)
+        self.engine_analysis.failed.connect(self.on_analysis_failed)
+        self.chess_board.core.subscribe(self.on_analysed_board_change)
+        self.engine_analysis.start(self.chess_board.board)
+        self.stop_analysis_action.setEnabled(True)
+
+    def stop_analysis(self):
+        if self.engine_analysis is not None:
+            self.chess_board.core.unsubscribe(self.on_analysed_board_change)
+            self.engine_analysis.stop()
+            self.engine_analysis.deleteLater()
+            self.engine_analysis = None
+            self.analysis_label.clear()
+            self.stop_analysis_action.setEnabled(False)
+
+    def on_analysed_board_change(self, board_change):
+        self.engine_analysis.set_position(self.chess_board.board)
+
+    def on_analysis_failed(self, error):
+        self.stop_analysis()
+        self.statusBar().showMessage(f"Engine analysis failed: {error}")
+
+    def start_journal(self, directory):
+        """
+        records the moves played on the board to a journal in the given
+        directory, resuming the game the last run left unfinished
+        """
+        self.game_journal = GameJournal(directory, self)
+        self.game_journal.failed.connect(self.statusBar().showMessage)
+        self.chess_board.move_manager.journal = self.game_journal
+        if self.game_journal.recovered_games:
+            # the latest game goes back on the board, the others get archived
+            game_id = list(self.game_journal.recovered_games)[-1]
+            self.game_journal.resume(self.chess_board.core, game_id)
+            self.game_journal.end_recovered_games()
+            self.statusBar().showMessage("Recovered the unfinished game")
+
+    def closeEvent(self, event):
+        self.stop_live_feed()
+        self.stop_analysis()
+        self.stop_clocks()
+        self.close_opening_book()
+        if self.game_journal is not None:
+            self.game_journal.close()
+            self.game_journal = None
+        super().closeEvent(event)
+
+    def find_games_with_position(self):
+        """
+        lists the games of the opened PGN database reaching the current
+        position, building the position index first if needed
+        """
+        if self.position_index is None:
+            from positionindex import PositionIndex
+
+            self.position_index = PositionIndex(self.pgn_database)
+        if not self.position_index.is_built():
+            progress = QtWidgets.QProgressDialog(
+                "Indexing positions...", None, 0, len(self.pgn_database), self
+            )
+            progress.setWindowModality(QtCore.Qt.WindowModal)
+            self.position_index.build(progress.setValue)
+            progress.close()
+
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle("Games with this position")
+        layout = QtWidgets.QVBoxLayout(dialog)
+        game_list = QtWidgets.QListWidget(dialog)
+        layout.addWidget(game_list)
+        for game_id, ply in self.position_index.find_games(self.chess_board.board):
+            headers = self.pgn_database.get_headers(game_id)
+            item = QtWidgets.QListWidgetItem(
+                f"{game_id + 1}. {headers['White']} - {headers['Black']}"
+                f"  {headers['Result']}  ({headers['Date']}), ply {ply}"
+            )
+            item.setData(QtCore.Qt.UserRole, (game_id, ply))
+            game_list.addItem(item)
+        game_list.itemActivated.connect(
+            lambda item: self.show_game(*item.data(QtCore.Qt.UserRole))
+        )
+        dialog.resize(500, 400)
+        dialog.show()
+
+
+class StartupProfile(QtCore.QObject):
+    """
+    prints how long each startup phase took, once the first frame is painted
+    & the piece images are loaded (--startup-profile)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.phases = []
+        self.last_time = STARTUP_TIME
+        self.pending_phases = {"first frame", "piece images"}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last_time, now - STARTUP_TIME))
+        self.last_time = now
+        self.pending_phases.discard(phase)
+        if not self.pending_phases:
+            self.print_phases()
+
+    def watch(self, window):
+        """
+        marks the first paint of the board & the arrival of the piece images
+        """
+        window.chess_board.viewport().installEventFilter(self)
+        window.chess_board.chess_pieces.piece_images_loader.ready.connect(
+            lambda: self.mark("piece images")
+        )
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.Paint:
+            watched.removeEventFilter(self)
+            # marked once the paint event got handled
+            QtCore.QTimer.singleShot(0, lambda: self.mark("first frame"))
+        return False
+
+    def print_phases(self):
+        print(f"{'phase':<16}{'duration':>12}{'since start':>14}", file=sys.stderr)
+        for phase, duration, elapsed in self.phases:
+            print(
+                f"{phase:<16}{duration * 1000:>9.1f} ms{elapsed * 1000:>11.1f} ms",
+                file=sys.stderr,
+            )
+
 
 if __name__ == "__main__":
-    app = QtWidgets.QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="YACS - Yet Another Chess Software")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="print a per phase time breakdown of the startup",
+    )
+    args, qt_args = parser.parse_known_args()
+
+    startup_profile = StartupProfile() if args.startup_profile else None
+    if startup_profile:
+        startup_profile.mark("imports")
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    if startup_profile:
+        startup_profile.mark("QApplication")
     window = ApplicationWindow()
+    if startup_profile:
+        startup_profile.mark("window")
+        startup_profile.watch(window)
     window.showMaximized()
+    if startup_profile:
+        startup_profile.mark("show")
+    # the recovery of the last games waits for the first frame
+    QtCore.QTimer.singleShot(0, lambda: window.start_journal(get_journal_dir()))
     sys.exit(app.exec())
@@ -1,104 +1,137 @@
+from collections import OrderedDict
+
 import chess
-from PySide6 import QtWidgets, QtCore
+
 import vars
+from profiler import profiled
 
 
 class MoveManager:
 
-    def __init__(self, chessboard):
-        self.chessboard = chessboard
+    def __init__(self, core):
+        self.core = core
         self.selected_square = None
         self.is_piece_moved = False
-        self.is_capture = False
-        self.is_ep = False
-        self.is_kingside_castling = False
-        self.is_queenside_castling = False
-
-    def move_piece(self, target_square):
-        if self.selected_square is not None:
-            for move in self.chessboard.board.legal_moves:
-                if (
-                    move.from_square == self.selected_square
-                    and move.to_square == target_square
-                ):
-                    if self._is_pawn_promotion(target_square):
-                        self._show_pawn_promotion_dialog(move)
-                    if self.chessboard.board.is_capture(move):
-                        self.is_capture = True
-                    if self.chessboard.board.is_en_passant(move):
-                        self.is_ep = True
-                    if self.chessboard.board.is_kingside_castling(move):
-                        self.is_kingside_castling = True
-                    if self.chessboard.board.is_queenside_castling(move):
-                        self.is_queenside_castling = True
-                    self.chessboard.board.push(move)
-                    self.is_piece_moved = True
-                    break
-
-    def _is_pawn_promotion(self, target_square):
+        # promotion_handler(square, color) lets the user pick the piece to
+        # promote to, then calls complete_promotion (or cancel_promotion).
+        # without one pawns are promoted to the first move's piece (a queen)
+        self.promotion_handler = None
+        # promotion moves waiting for the piece to be picked
+        self.pending_promotion_moves = None
+        # GameJournal the moves get recorded to (None to not record them)
+        self.journal = None
+        # ChessClock charged for every move committed (None without clocks)
+        self.clock = None
+        # position key => {from_square: {to_square: [moves]}}, in LRU order
+        self.legal_moves_cache = OrderedDict()
+
+    @profiled("move_piece")
+    def move_piece(self, target_square, promotion=None):
         """
-        check if the pawn reached at the last rank or not
+        moves the selected piece to the target square, if it's a legal move.
+        returns the BoardChange of the move (or None)
         """
-        return self.chessboard.board.piece_type_at(
-            self.selected_square
-        ) == chess.PAWN and (
-            (
-                self.chessboard.board.turn == chess.WHITE
-                and chess.square_rank(target_square) == 7
-            )
-            or (
-                self.chessboard.board.turn == chess.BLACK
-                and chess.square_rank(target_square) == 0
+        if self.selected_square is not None:
+            moves = (
+                self.get_legal_moves_index()
+                .get(self.selected_square, {})
+                .get(target_square)
             )
-        )
-
-    def _show_pawn_promotion_dialog(self, move):
-        pawn_promotion = PawnPromotion(self.chessboard)
-        pawn_promotion.pawn_promotion_dialog(move)
+            if moves:
+                move = moves[0]
+                if move.promotion is not None:
+                    if promotion is None and self.promotion_handler is not None:
+                        # pushed once the piece is picked, without waiting here
+                        self.pending_promotion_moves = moves
+                        self.promotion_handler(target_square, self.core.board.turn)
+                        return None
+                    move = self._get_promotion_move(moves, promotion)
+                return self._push_move(move)
+        return None
+
+    def complete_promotion(self, promotion):
+        """
+        pushes the pending promotion move to the picked piece type, returns
+        its BoardChange (or None if no promotion is pending)
+        """
+        moves = self.pending_promotion_moves
+        if moves is None:
+            return None
+        self.pending_promotion_moves = None
+        return self._push_move(self._get_promotion_move(moves, promotion))
+
+    def cancel_promotion(self):
+        self.pending_promotion_moves = None
+
+    def _push_move(self, move):
+        if self.clock is not None and not self.clock.commit_move():
+            return None  # out of time
+        board_change = self.core.push(move)
+        self.is_piece_moved = True
+        if self.journal is not None:
+            self.journal.record_move(self.core)
+        return board_change
+
+    def _get_promotion_move(self, moves, promotion):
+        """
+        returns the promotion move (out of the given ones) to the given piece
+        type
+        """
+        # the legal moves are cached, so pick the move instead of mutating one
+        for move in moves:
+            if move.promotion == promotion:
+                return move
+        return moves[0]
 
     def get_last_move(self):
-        return self.chessboard.board.peek()
+        return self.core.board.peek()
+
+    def get_position_key(self):
+        """
+        returns the key the legal moves of the current position are cached by
+        """
+        board = self.core.board
+        # the bitboards themselves: a tuple of ints is much cheaper than
+        # hashing the position (the polyglot hash is computed in python)
+        return (
+            board.pawns,
+            board.knights,
+            board.bishops,
+            board.rooks,
+            board.queens,
+            board.kings,
+            board.occupied_co[chess.WHITE],
+            board.occupied_co[chess.BLACK],
+            board.turn,
+            board.castling_rights,
+            board.ep_square,
+            board.chess960,
+        )
+
+    def get_legal_moves_index(self):
+        """
+        returns the legal moves of the current position indexed as
+        {from_square: {to_square: [moves]}}, built once per position
+        """
+        key = self.get_position_key()
+        index = self.legal_moves_cache.get(key)
+        if index is not None:
+            self.legal_moves_cache.move_to_end(key)
+            return index
+
+        index = {}
+        for move in self.core.board.legal_moves:
+            index.setdefault(move.from_square, {}).setdefault(
+                move.to_square, []
+            ).append(move)
+
+        self.legal_moves_cache[key] = index
+        if len(self.legal_moves_cache) > vars.LEGAL_MOVES_CACHE_SIZE:
+            self.legal_moves_cache.popitem(last=False)
+        return index
 
     def get_legal_moves(self, square):
         moves = []
-        for move in self.chessboard.board.legal_moves:
-            if move.from_square == square:
-                moves.append(move)
+        for target_moves in self.get_legal_moves_index().get(square, {}).values():
+            moves.extend(target_moves)
         return moves
-
-
-class PawnPromotion:
-    def __init__(self, chessboard):
-        self.chessboard = chessboard
-
-    def pawn_promotion_dialog(self, move):
-        piece_options = ["Queen", "Rook", "Knight", "Bishop"]
-
-        dialog = QtWidgets.QDialog(self.chessboard)
-        dialog.setModal(True)
-        dialog.setWindowTitle("Promote Pawn")
-        dialog.setFixedWidth(300)
-
-        layout = QtWidgets.QVBoxLayout(dialog)
-        dialog.setLayout(layout)
-
-        # Create a button for each piece option
-        for piece in piece_options:
-            button = QtWidgets.QPushButton(piece)
-            button.clicked.connect(
-                lambda move=move, piece=piece: self.promote_pawn(dialog, move, piece)
-            )
-            layout.addWidget(button)
-
-        dialog.exec()
-
-    def promote_pawn(self, dialog, move, piece):
-        piece_map = {
-            "Queen": chess.QUEEN,
-            "Rook": chess.ROOK,
-            "Knight": chess.KNIGHT,
-            "Bishop": chess.BISHOP,
-        }
-        move.promotion = piece_map[piece]
-
-        dialog.accept()  # Close the dialog after promoting the pawn
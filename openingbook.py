@@ -0,0 +1,31 @@
+import chess.polyglot
+
+
+class OpeningBook:
+    """
+    a Polyglot opening book (.bin). the file is memory-mapped & binary
+    searched by position key, so only the pages of the looked up entries
+    get read, whatever the size of the book
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = chess.polyglot.MemoryMappedReader(path)
+
+    def close(self):
+        self.reader.close()
+
+    def get_move_weights(self, board):
+        """
+        returns {move: share of the weights of the book moves} of the
+        position of a chess.Board, empty if it's out of the book
+        """
+        # the entries are decoded by python-chess, castling moves included
+        entries = list(self.reader.find_all(board))
+        total_weight = sum(entry.weight for entry in entries)
+        move_weights = {}
+        for entry in entries:
+            move_weights[entry.move] = (
+                move_weights.get(entry.move, 0) + entry.weight / total_weight
+            )
+        return move_weights
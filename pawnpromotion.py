@@ -0,0 +1,83 @@
+import chess
+from PySide6 import QtCore, QtGui, QtWidgets
+
+import vars
+
+# pieces of the picker, from the promotion square towards the center
+PROMOTION_PIECE_TYPES = [chess.QUEEN, chess.KNIGHT, chess.ROOK, chess.BISHOP]
+
+
+class PawnPromotion:
+    """
+    piece picker drawn over the board, on the file of the promotion square.
+    its items are created once & only shown/hidden, & showing it doesn't
+    block the event loop: the pending move gets pushed once a piece is
+    clicked (see MoveManager.complete_promotion)
+    """
+
+    def __init__(self, chessboard, scene):
+        self.chessboard = chessboard
+        # square => piece type of the shown picker
+        self.piece_types = {}
+        # dims the rest of the board while a piece is being picked
+        self.backdrop = scene.addRect(
+            0, 0, vars.SQUARE_SIZE * 8, vars.SQUARE_SIZE * 8, QtCore.Qt.NoPen
+        )
+        self.backdrop.setBrush(QtGui.QColor(0, 0, 0, 90))
+        self.backdrop.setZValue(3)
+        self.background = scene.addRect(
+            0, 0, vars.SQUARE_SIZE, vars.SQUARE_SIZE * 4, QtCore.Qt.NoPen
+        )
+        self.background.setBrush(
+            QtGui.QColor(vars.THEME_COLORS["promotion_background"])
+        )
+        self.background.setZValue(4)
+        self.piece_items = []
+        for _ in PROMOTION_PIECE_TYPES:
+            piece_item = QtWidgets.QGraphicsPixmapItem()
+            piece_item.setZValue(5)
+            scene.addItem(piece_item)
+            self.piece_items.append(piece_item)
+        self.hide()
+
+    def show(self, square, color):
+        """
+        shows the pieces a pawn of the given color can promote to on the
+        given square
+        """
+        # the picker runs down the board from rank 8, up the board from rank 1
+        direction = -1 if chess.square_rank(square) == 7 else 1
+        self.piece_types = {}
+        picker_top = None
+        for offset, (piece_type, piece_item) in enumerate(
+            zip(PROMOTION_PIECE_TYPES, self.piece_items)
+        ):
+            picker_square = square + offset * direction * 8
+            _, _, x, y = self.chessboard.get_square_coordinates(picker_square)
+            piece_item.setPixmap(
+                self.chessboard.chess_pieces.get_piece_image(
+                    chess.Piece(piece_type, color)
+                )
+            )
+            piece_item.setPos(x + 5, y + 5)
+            self.piece_types[picker_square] = piece_type
+            picker_top = y if picker_top is None else min(picker_top, y)
+        self.background.setPos(x, picker_top)
+        self.set_visible(True)
+
+    def hide(self):
+        self.piece_types = {}
+        self.set_visible(False)
+
+    def set_visible(self, visible):
+        self.backdrop.setVisible(visible)
+        self.background.setVisible(visible)
+        for piece_item in self.piece_items:
+            piece_item.setVisible(visible)
+
+    def get_piece_type(self, square):
+        """
+        returns the piece type picked by clicking the given square, None if
+        it's outside of the picker
+        """
+        return self.piece_types.get(square)
@@ -0,0 +1,148 @@
+import io
+import mmap
+import os
+import re
+import struct
+from array import array
+
+import chess.pgn
+
+# a game starts at a header tag opening the file or following a blank line
+GAME_START_REGEX = re.compile(
+    rb'(?:\A|\n[ \t]*\r?\n)[ \t\r\n]*\[(?=[A-Za-z0-9_]+[ \t]+")'
+)
+HEADER_REGEX = re.compile(rb'^\[([A-Za-z0-9_]+)[ \t]+"(.*)"\][ \t]*\r?$', re.MULTILINE)
+HEADER_BLOCK_END_REGEX = re.compile(rb"\n[ \t]*\r?\n|\n[^\[\s]")
+
+INDEX_HEADERS = ("White", "Black", "Result", "Date")
+INDEX_MAGIC = b"YACSIDX1"
+INDEX_HEADER_FORMAT = "<8sQQQ"  # magic, pgn size, pgn mtime, game count
+
+
+class PgnDatabase:
+    """
+    a PGN file opened through mmap, with a byte offset index of its games.
+    the index is built by one streaming pass over the file & saved in a
+    sidecar file, so games get parsed one at a time, only when loaded
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = f"{path}.yacsidx"
+        self.pgn_file = open(path, "rb")
+        self.size = os.fstat(self.pgn_file.fileno()).st_size
+        self.mtime = os.fstat(self.pgn_file.fileno()).st_mtime_ns
+        self.mmap = None
+        if self.size:
+            self.mmap = mmap.mmap(self.pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+        # game n spans offsets[n]:offsets[n + 1] of the file
+        self.offsets = array("Q")
+        # INDEX_HEADERS of game n, tab separated, at headers[header_offsets[n]:...]
+        self.headers = b""
+        self.header_offsets = array("Q")
+
+        if not self.load_index():
+            self.build_index()
+            self.save_index()
+
+    def __len__(self):
+        return max(len(self.offsets) - 1, 0)
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            self.mmap = None
+        self.pgn_file.close()
+
+    def build_index(self):
+        """
+        scans the file once for game starts & the indexed header fields
+        """
+        self.offsets = array("Q")
+        self.header_offsets = array("Q", [0])
+        headers = bytearray()
+        if self.mmap is not None:
+            for match in GAME_START_REGEX.finditer(self.mmap):
+                game_start = match.end() - 1
+                self.offsets.append(game_start)
+                headers += self.read_index_headers(game_start)
+                self.header_offsets.append(len(headers))
+        self.offsets.append(self.size)
+        self.headers = bytes(headers)
+
+    def read_index_headers(self, game_start):
+        """
+        returns the INDEX_HEADERS of the game starting at the given offset
+        """
+        block_end = HEADER_BLOCK_END_REGEX.search(self.mmap, game_start)
+        block_end = block_end.start() if block_end else self.size
+        values = dict.fromkeys(INDEX_HEADERS, b"")
+        for header in HEADER_REGEX.finditer(self.mmap, game_start, block_end):
+            name = header.group(1).decode("ascii")
+            if name in values:
+                values[name] = header.group(2).replace(b"\t", b" ")
+        return b"\t".join(values.values())
+
+    def load_index(self):
+        """
+        loads the sidecar index, returns False if it's missing or outdated
+        """
+        try:
+            with open(self.index_path, "rb") as index_file:
+                magic, size, mtime, game_count = struct.unpack(
+                    INDEX_HEADER_FORMAT,
+                    index_file.read(struct.calcsize(INDEX_HEADER_FORMAT)),
+                )
+                if (magic, size, mtime) != (INDEX_MAGIC, self.size, self.mtime):
+                    return False
+                offsets = array("Q")
+                offsets.fromfile(index_file, game_count + 1)
+                header_offsets = array("Q")
+                header_offsets.fromfile(index_file, game_count + 1)
+                headers = index_file.read()
+        except (OSError, EOFError, struct.error):
+            return False
+
+        self.offsets = offsets
+        self.header_offsets = header_offsets
+        self.headers = headers
+        return True
+
+    def save_index(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as index_file:
+                index_file.write(
+                    struct.pack(
+                        INDEX_HEADER_FORMAT,
+                        INDEX_MAGIC,
+                        self.size,
+                        self.mtime,
+                        len(self),
+                    )
+                )
+                self.offsets.tofile(index_file)
+                self.header_offsets.tofile(index_file)
+                index_file.write(self.headers)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass  # e.g. read only directory, the index gets rebuilt next time
+
+    def get_headers(self, game_id):
+        """
+        returns the INDEX_HEADERS of a game as a dict, without parsing it
+        """
+        values = self.headers[
+            self.header_offsets[game_id] : self.header_offsets[game_id + 1]
+        ].decode("utf-8", errors="replace")
+        return dict(zip(INDEX_HEADERS, values.split("\t")))
+
+    def read_game(self, game_id, visitor=chess.pgn.GameBuilder):
+        """
+        parses & returns the chess.pgn.Game at the given index (or the result
+        of the given chess.pgn visitor)
+        """
+        game_text = self.mmap[self.offsets[game_id] : self.offsets[game_id + 1]]
+        return chess.pgn.read_game(
+            io.StringIO(game_text.decode("utf-8", errors="replace")), Visitor=visitor
+        )
@@ -0,0 +1,252 @@
+import hashlib
+import math
+import os
+
+from PySide6 import QtCore, QtGui
+
+import vars
+
+PIECE_COLORS = ["w", "b"]
+PIECE_NAMES = ["P", "N", "B", "R", "Q", "K"]
+
+
+def get_piece_image_path(piece_set, piece_color, piece_name):
+    return os.path.join(vars.PIECES_DIR, piece_set, f"{piece_color}{piece_name}.svg")
+
+
+def get_piece_sets():
+    """
+    returns the names of the piece sets under assets/pieces
+    """
+    return sorted(
+        entry
+        for entry in os.listdir(vars.PIECES_DIR)
+        if os.path.isdir(os.path.join(vars.PIECES_DIR, entry))
+    )
+
+
+def get_cache_dir():
+    """
+    returns the directory where rasterized piece images are stored
+    """
+    cache_location = QtCore.QStandardPaths.writableLocation(
+        QtCore.QStandardPaths.GenericCacheLocation
+    )
+    return os.path.join(cache_location, "yacs", "pieces")
+
+
+def get_piece_set_hash(piece_set):
+    """
+    returns the content hash of the svg files of a piece set, so that cached
+    images get regenerated as soon as one of the assets changes
+    """
+    sha1 = hashlib.sha1()
+    for piece_color in PIECE_COLORS:
+        for piece_name in PIECE_NAMES:
+            with open(
+                get_piece_image_path(piece_set, piece_color, piece_name), "rb"
+            ) as svg_file:
+                sha1.update(svg_file.read())
+    return sha1.hexdigest()[:16]
+
+
+def render_piece_image(image_path, pixel_size):
+    """
+    renders a svg file into a (pixel_size x pixel_size) QImage
+    """
+    # QtSvg is only needed on a cold cache, so it isn't imported at startup
+    from PySide6 import QtSvg
+
+    renderer = QtSvg.QSvgRenderer(image_path)
+    image = QtGui.QImage(
+        pixel_size, pixel_size, QtGui.QImage.Format_ARGB32_Premultiplied
+    )
+    image.fill(QtCore.Qt.transparent)
+    painter = QtGui.QPainter(image)
+    renderer.render(painter)
+    painter.end()
+    return image
+
+
+def get_pixel_size(size, render_scale=1.0):
+    """
+    returns the raster size of a `size` (logical pixels) piece drawn at the
+    given scale (view zoom x device pixel ratio), rounded up to a multiple of
+    4 so that resizing the board doesn't rasterize every possible size
+    """
+    return max(4, math.ceil(size * render_scale / 4) * 4)
+
+
+def load_piece_image_data(piece_set, pixel_size):
+    """
+    returns {(piece_color, piece_name): QImage} of a piece set.
+    the rasters are read from (or written to) the on-disk cache, so a warm
+    start doesn't parse any svg. only uses QImage, so that it can run in a
+    worker thread
+    """
+    set_hash = get_piece_set_hash(piece_set)
+    cache_dir = get_cache_dir()
+    images_dir = os.path.join(cache_dir, f"{piece_set}-{set_hash}-{pixel_size}")
+
+    piece_images = {}
+    for piece_color in PIECE_COLORS:
+        for piece_name in PIECE_NAMES:
+            png_path = os.path.join(images_dir, f"{piece_color}{piece_name}.png")
+            image = QtGui.QImage(png_path)
+            if image.isNull():
+                image = render_piece_image(
+                    get_piece_image_path(piece_set, piece_color, piece_name),
+                    pixel_size,
+                )
+                save_piece_image(image, png_path)
+            piece_images[(piece_color, piece_name)] = image
+
+    remove_stale_piece_images(cache_dir, piece_set, set_hash)
+    return piece_images
+
+
+def load_atlas_image(pixel_size):
+    """
+    returns (QImage, piece_sets): a sprite atlas of every piece set
+    rasterized at pixel_size, one row per piece set & one column per piece
+    (the colors x names of PIECE_COLORS & PIECE_NAMES).
+    the atlas is a single png of the on-disk cache, so a warm start decodes
+    one file whatever the number of piece sets. only uses QImage, so that
+    it can run in a worker thread
+    """
+    piece_sets = get_piece_sets()
+    sha1 = hashlib.sha1()
+    for piece_set in piece_sets:
+        sha1.update(f"{piece_set}-{get_piece_set_hash(piece_set)}".encode())
+    atlas_hash = sha1.hexdigest()[:16]
+    cache_dir = get_cache_dir()
+    png_path = os.path.join(cache_dir, f"atlas-{atlas_hash}-{pixel_size}.png")
+
+    atlas = QtGui.QImage(png_path)
+    if atlas.isNull():
+        # QtSvg is only needed on a cold cache, so it isn't imported at startup
+        from PySide6 import QtSvg
+
+        atlas = QtGui.QImage(
+            pixel_size * len(PIECE_COLORS) * len(PIECE_NAMES),
+            pixel_size * len(piece_sets),
+            QtGui.QImage.Format_ARGB32_Premultiplied,
+        )
+        atlas.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(atlas)
+        for row, piece_set in enumerate(piece_sets):
+            for column, (piece_color, piece_name) in enumerate(get_atlas_pieces()):
+                QtSvg.QSvgRenderer(
+                    get_piece_image_path(piece_set, piece_color, piece_name)
+                ).render(
+                    painter,
+                    QtCore.QRectF(
+                        column * pixel_size, row * pixel_size, pixel_size, pixel_size
+                    ),
+                )
+        painter.end()
+        save_piece_image(atlas, png_path)
+
+    remove_stale_piece_images(cache_dir, "atlas", atlas_hash)
+    return atlas, piece_sets
+
+
+def get_atlas_pieces():
+    """
+    returns the (piece_color, piece_name) of the columns of an atlas
+    """
+    return [
+        (piece_color, piece_name)
+        for piece_color in PIECE_COLORS
+        for piece_name in PIECE_NAMES
+    ]
+
+
+def atlas_to_pixmaps(atlas_image, piece_sets, size):
+    """
+    cuts an atlas into {piece_set: {(piece_color, piece_name): QPixmap}} of
+    `size` logical pixels, must run in the GUI thread
+    """
+    atlas = QtGui.QPixmap.fromImage(atlas_image)
+    pixel_size = atlas_image.height() // len(piece_sets)
+    piece_pixmaps = {}
+    for row, piece_set in enumerate(piece_sets):
+        piece_pixmaps[piece_set] = {}
+        for column, key in enumerate(get_atlas_pieces()):
+            pixmap = atlas.copy(
+                column * pixel_size, row * pixel_size, pixel_size, pixel_size
+            )
+            pixmap.setDevicePixelRatio(pixel_size / size)
+            piece_pixmaps[piece_set][key] = pixmap
+    return piece_pixmaps
+
+
+def render_placeholder_images(size, render_scale=1.0):
+    """
+    returns {(piece_color, piece_name): QPixmap} of simple discs with the
+    piece letter, shown until the real piece images are loaded
+    """
+    pixel_size = get_pixel_size(size, render_scale)
+    placeholders = {}
+    for piece_color in PIECE_COLORS:
+        for piece_name in PIECE_NAMES:
+            pixmap = QtGui.QPixmap(pixel_size, pixel_size)
+            pixmap.fill(QtCore.Qt.transparent)
+            fill_color, text_color = (
+                (QtCore.Qt.white, QtCore.Qt.black)
+                if piece_color == "w"
+                else (QtCore.Qt.black, QtCore.Qt.white)
+            )
+            painter = QtGui.QPainter(pixmap)
+            # scaled by hand, a painter ignores device pixel ratios below 1
+            painter.scale(pixel_size / size, pixel_size / size)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            painter.setPen(QtGui.QPen(QtCore.Qt.gray, 2))
+            painter.setBrush(fill_color)
+            disc = QtCore.QRectF(size * 0.15, size * 0.15, size * 0.7, size * 0.7)
+            painter.drawEllipse(disc)
+            painter.setPen(text_color)
+            painter.drawText(disc, QtCore.Qt.AlignCenter, piece_name)
+            painter.end()
+            pixmap.setDevicePixelRatio(pixel_size / size)
+            placeholders[(piece_color, piece_name)] = pixmap
+    return placeholders
+
+
+def save_piece_image(image, png_path):
+    """
+    writes a piece image to the cache, through a temporary file so that a
+    concurrently starting board never reads a half written png
+    """
+    try:
+        os.makedirs(os.path.dirname(png_path), exist_ok=True)
+        tmp_path = f"{png_path}.{os.getpid()}.tmp"
+        if image.save(tmp_path, "PNG"):
+            os.replace(tmp_path, png_path)
+    except OSError:
+        pass  # the cache is an optimisation, the image is still usable
+
+
+def remove_stale_piece_images(cache_dir, piece_set, set_hash):
+    """
+    removes the cached images of older versions of a piece set (or the
+    atlases of older versions of the piece sets)
+    """
+    try:
+        entries = os.listdir(cache_dir)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.startswith(f"{piece_set}-") and not entry.startswith(
+            f"{piece_set}-{set_hash}-"
+        ):
+            entry_path = os.path.join(cache_dir, entry)
+            try:
+                if not os.path.isdir(entry_path):
+                    os.remove(entry_path)
+                    continue
+                for file_name in os.listdir(entry_path):
+                    os.remove(os.path.join(entry_path, file_name))
+                os.rmdir(entry_path)
+            except OSError:
+                pass
@@ -0,0 +1,161 @@
+import sqlite3
+
+import chess.pgn
+import chess.polyglot
+
+from boardcore import get_move_squares
+
+ZOBRIST_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+
+
+def to_signed_key(key):
+    """
+    returns a 64-bit zobrist hash as a signed (sqlite) integer
+    """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def get_position_key(board):
+    return to_signed_key(chess.polyglot.zobrist_hash(board))
+
+
+def get_piece_hash(piece, square):
+    """
+    returns the zobrist hash of a piece standing on a square
+    """
+    piece_index = (piece.piece_type - 1) * 2 + int(piece.color)
+    return chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * piece_index + square]
+
+
+class PositionIndex:
+    """
+    maps the position keys of every game of a PgnDatabase to the
+    (game id, ply) pairs they occur at, in a sqlite file next to the PGN
+    """
+
+    def __init__(self, pgn_database):
+        self.pgn_database = pgn_database
+        self.connection = sqlite3.connect(f"{pgn_database.path}.yacspos")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        # clustered on the key, so a lookup is a single b-tree range scan
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS positions ("
+            "key INTEGER, game INTEGER, ply INTEGER, PRIMARY KEY (key, game)"
+            ") WITHOUT ROWID"
+        )
+
+    def close(self):
+        self.connection.close()
+
+    def is_built(self):
+        """
+        returns True if the index is up to date with the PGN file
+        """
+        meta = dict(self.connection.execute("SELECT name, value FROM meta"))
+        return (
+            meta.get("size") == self.pgn_database.size
+            and meta.get("mtime") == self.pgn_database.mtime
+        )
+
+    def build(self, progress_callback=None):
+        """
+        (re)builds the index, calling progress_callback(games done) now & then
+        """
+        # the index can always be rebuilt from the PGN, so skip the fsyncs
+        self.connection.execute("PRAGMA synchronous = OFF")
+        with self.connection:
+            self.connection.execute("DELETE FROM positions")
+            self.connection.execute("DELETE FROM meta")
+            # insert unsorted first, then into the b-tree in key order, which
+            # is much faster than random inserts into the clustered table
+            self.connection.execute(
+                "CREATE TEMP TABLE staging (key INTEGER, game INTEGER, ply INTEGER)"
+            )
+            for game_id in range(len(self.pgn_database)):
+                self.connection.executemany(
+                    "INSERT INTO staging VALUES (?, ?, ?)",
+                    self.get_game_positions(game_id),
+                )
+                if progress_callback is not None and game_id % 100 == 0:
+                    progress_callback(game_id)
+            self.connection.execute(
+                "INSERT OR IGNORE INTO positions "
+                "SELECT key, game, ply FROM staging ORDER BY key, game"
+            )
+            self.connection.execute("DROP TABLE staging")
+            self.connection.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("size", self.pgn_database.size), ("mtime", self.pgn_database.mtime)],
+            )
+
+    def get_game_positions(self, game_id):
+        """
+        returns [(key, game_id, ply)] for the positions reached in a game,
+        only the first occurrence of each position is kept
+        """
+        positions = self.pgn_database.read_game(game_id, PositionKeysVisitor)
+        if positions is None:
+            return []
+        return [(key, game_id, ply) for key, ply in positions.items()]
+
+    def find_games(self, board, limit=1000):
+        """
+        returns [(game id, ply)] of the games that reached the given position
+        """
+        return self.connection.execute(
+            "SELECT game, ply FROM positions WHERE key = ? ORDER BY game LIMIT ?",
+            (get_position_key(board), limit),
+        ).fetchall()
+
+
+class PositionKeysVisitor(chess.pgn.BaseVisitor):
+    """
+    collects {position key: first ply} of a game's mainline while it gets
+    parsed. the pieces part of the hash is updated from the squares each move
+    changed, instead of hashing the whole board at every ply
+    """
+
+    def begin_game(self):
+        self.positions = {}
+        self.ply = 0
+        self.board_hash = None
+        self.move_squares = None
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self.move_squares = [
+            (square, board.piece_at(square)) for square in get_move_squares(board, move)
+        ]
+
+    def visit_board(self, board):
+        if self.board_hash is None:
+            self.board_hash = ZOBRIST_HASHER.hash_board(board)
+        elif self.move_squares is None:
+            return  # the move didn't parse, so the board didn't change
+        else:
+            for square, piece_before in self.move_squares:
+                piece_after = board.piece_at(square)
+                if piece_before != piece_after:
+                    for piece in (piece_before, piece_after):
+                        if piece is not None:
+                            self.board_hash ^= get_piece_hash(piece, square)
+            self.move_squares = None
+            self.ply += 1
+
+        key = (
+            self.board_hash
+            ^ ZOBRIST_HASHER.hash_castling(board)
+            ^ ZOBRIST_HASHER.hash_ep_square(board)
+            ^ ZOBRIST_HASHER.hash_turn(board)
+        )
+        self.positions.setdefault(to_signed_key(key), self.ply)
+
+    def handle_error(self, error):
+        pass  # the rest of a broken game is skipped, like chess.pgn does
+
+    def result(self):
+        return self.positions
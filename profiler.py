@@ -0,0 +1,126 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import vars
+
+
+class Profiler:
+    """
+    lightweight timers around the interaction pipeline, switched on by the
+    YACS_PROFILE=1 environment variable (or at runtime from the View menu).
+    keeps the latest durations per timer & a trace that can be dumped in
+    the chrome trace event format (chrome://tracing, perfetto)
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        # timer name => durations in nanoseconds, latest ones only
+        self.samples = {}
+        # (name, start ns, duration ns, thread id)
+        self.trace_events = deque(maxlen=vars.PROFILER_MAX_TRACE_EVENTS)
+        # end times of the latest frames, for the fps
+        self.frame_times = deque(maxlen=vars.PROFILER_MAX_SAMPLES)
+        self.start_ns = time.perf_counter_ns()
+
+    def record(self, name, start_ns, end_ns):
+        duration_ns = end_ns - start_ns
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=vars.PROFILER_MAX_SAMPLES)
+        samples.append(duration_ns)
+        self.trace_events.append((name, start_ns, duration_ns, threading.get_ident()))
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        if not self.enabled:
+            yield
+            return
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start_ns, time.perf_counter_ns())
+
+    def record_frame(self):
+        self.frame_times.append(time.perf_counter_ns())
+
+    def clear(self):
+        self.samples.clear()
+        self.trace_events.clear()
+        self.frame_times.clear()
+
+    def get_percentiles(self, name):
+        """
+        returns the (p50, p99) of a timer in milliseconds
+        """
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return 0.0, 0.0
+        p50 = samples[len(samples) // 2]
+        p99 = samples[min(len(samples) - 1, len(samples) * 99 // 100)]
+        return p50 / 1e6, p99 / 1e6
+
+    def get_fps(self):
+        """
+        returns the frames painted during the last second
+        """
+        one_second_ago = time.perf_counter_ns() - 1_000_000_000
+        return sum(1 for frame_time in self.frame_times if frame_time > one_second_ago)
+
+    def get_summary_lines(self):
+        lines = [f"{self.get_fps()} fps"]
+        for name in self.samples:
+            p50, p99 = self.get_percentiles(name)
+            lines.append(f"{name}: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+        return lines
+
+    def dump_chrome_trace(self, path):
+        """
+        writes the recorded timings as a chrome trace event JSON file
+        """
+        pid = os.getpid()
+        trace = {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start_ns - self.start_ns) / 1000,
+                    "dur": duration_ns / 1000,
+                    "pid": pid,
+                    "tid": thread_id,
+                }
+                for name, start_ns, duration_ns, thread_id in self.trace_events
+            ],
+            "displayTimeUnit": "ms",
+        }
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(trace, trace_file)
+
+
+PROFILER = Profiler(enabled=os.environ.get("YACS_PROFILE") == "1")
+
+
+def profiled(name):
+    """
+    decorator timing every call of a function with the PROFILER
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return function(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                PROFILER.record(name, start_ns, time.perf_counter_ns())
+
+        return wrapper
+
+    return decorator
@@ -1,5 +1,19 @@
+import os
+
 VERSION = "0.2 Alpha"
 SQUARE_SIZE = 70
+PIECES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "assets", "pieces"
+)
+# piece set of the boards (a directory of PIECES_DIR)
+PIECE_SET = "cardinal"
+# square colors of the board themes, applied over THEME_COLORS
+BOARD_THEMES = {
+    "green": {"dark_square": "#769656", "light_square": "#eeeed2"},
+    "brown": {"dark_square": "#b58863", "light_square": "#f0d9b5"},
+    "blue": {"dark_square": "#8ca2ad", "light_square": "#dee3e6"},
+    "grey": {"dark_square": "#8b8b8b", "light_square": "#d9d9d9"},
+}
 THEME_COLORS = {
     "dark_square": "#769656",
     "light_square": "#eeeed2",
@@ -11,4 +25,38 @@ THEME_COLORS = {
     "arrow_ctrl": "#4287f5",
     "arrow_alt": "#eb4034",
     "arrow_shift": "#f5a442",
+    "heatmap_white": "#4287f5",
+    "heatmap_black": "#eb4034",
+    "promotion_background": "#f0f0f0",
+    "book_move_hint": "#1a4f9c",
 }
+# number of positions whose legal move index is kept by the MoveManager
+LEGAL_MOVES_CACHE_SIZE = 256
+# plies between two board snapshots of the move history
+HISTORY_KEYFRAME_INTERVAL = 16
+# timings kept per profiler timer, trace events kept for the chrome trace
+PROFILER_MAX_SAMPLES = 1000
+PROFILER_MAX_TRACE_EVENTS = 100000
+# milliseconds between two refreshes of the profiling overlay
+PROFILER_OVERLAY_INTERVAL = 500
+# milliseconds without a resize before the board gets re-rasterized
+RESIZE_DEBOUNCE_INTERVAL = 150
+# rendered sizes of the piece images & board layer kept for a quick resize
+RENDER_SIZE_CACHE_SIZE = 4
+# boards shown at most by the broadcast grid, & their smallest size in pixels
+BROADCAST_MAX_BOARDS = 64
+BROADCAST_BOARD_SIZE = 160
+# milliseconds between two checks of a live PGN file, & between two
+# applications of its changes to the boards (about one frame)
+LIVE_FEED_POLL_INTERVAL = 100
+LIVE_FEED_FRAME_INTERVAL = 16
+# milliseconds between two updates of the engine analysis shown, & number
+# of moves of its principal variation
+ENGINE_INFO_INTERVAL = 100
+ENGINE_PV_LENGTH = 8
+# bytes of game journal after which it gets rewritten with the open games only
+JOURNAL_COMPACT_SIZE = 1 << 20
+# time control the clocks start with, & seconds left under which they show
+# tenths of seconds
+DEFAULT_TIME_CONTROL = "300+3"
+CLOCK_LOW_TIME = 10